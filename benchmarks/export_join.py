@@ -0,0 +1,149 @@
+"""Export of a sparse catalog: outer join pass vs. inner join plus per-menu queries.
+
+The script fills and then clears the tables, so it runs only against a disposable
+database given in BENCHMARK_DATABASE_URL (its schema is migrated first):
+
+    BENCHMARK_DATABASE_URL=postgresql+asyncpg://... \
+        poetry run python -m benchmarks.export_join --menus 500
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections.abc import Awaitable, Callable
+
+from menu_app.database import SQLALCHEMY_DATABASE_URL
+from menu_app.migrations import migrate
+from menu_app.models.dish import Dish
+from menu_app.models.menu import Menu
+from menu_app.models.submenu import Submenu
+from menu_app.restaurant_export import make_csv_text, restaurant_menu_export
+from menu_app.restaurant_repo import RestaurantRepository
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+# Отдельная БД под бенчмарк: в конце он удаляет все меню
+BENCHMARK_DATABASE_URL: str | None = os.getenv('BENCHMARK_DATABASE_URL')
+
+
+async def insert_sparse_catalog(db: AsyncSession, menus_count: int) -> None:
+    # Каждое второе меню без подменю, каждое второе подменю без блюд
+    await db.execute(
+        text(
+            "INSERT INTO menus (id, title, description) \
+            SELECT gen_random_uuid(), 'Меню ' || n, 'Описание' \
+            FROM generate_series(1, CAST(:count AS integer)) AS n"
+        ),
+        {'count': menus_count},
+    )
+    await db.execute(
+        text(
+            "INSERT INTO submenus (id, menu_id, title, description) \
+            SELECT gen_random_uuid(), id, title || ' подменю ' || n, 'Описание' \
+            FROM (SELECT id, title, row_number() OVER (ORDER BY id) AS number FROM menus) AS m, \
+            generate_series(1, 4) AS n \
+            WHERE m.number % 2 = 0"
+        ),
+    )
+    await db.execute(
+        text(
+            "INSERT INTO dishes (id, submenu_id, title, description, price) \
+            SELECT gen_random_uuid(), id, title || ' блюдо ' || n, 'Описание', 9.99 \
+            FROM (SELECT id, title, row_number() OVER (ORDER BY id) AS number FROM submenus) AS s, \
+            generate_series(1, 5) AS n \
+            WHERE s.number % 2 = 0"
+        ),
+    )
+    await db.commit()
+
+
+async def export_inner_join(db: AsyncSession) -> str:
+    # Прежний экспорт: пустые меню и подменю теряются
+    result = await db.stream(
+        select(
+            Menu.id, Menu.title, Menu.description,
+            Submenu.id, Submenu.title, Submenu.description,
+            Dish.id, Dish.title, Dish.description, Dish.price,
+        )
+        .select_from(Menu)
+        .join(Submenu)
+        .join(Dish)
+        .order_by(Menu.id, Submenu.id, Dish.id),
+    )
+    return make_csv_text([row async for row in result])
+
+
+async def export_per_menu_queries(db: AsyncSession) -> str:
+    # Полный экспорт без внешних соединений: запросы на каждое меню и подменю
+    repo = RestaurantRepository(db)
+    export_rows: list[list] = []
+
+    for menu in sorted(await repo.read_menus(), key=lambda menu: menu.id):
+        export_rows.append([menu.id, menu.title, menu.description, '', '', ''])
+
+        for submenu in sorted(await repo.read_submenus(menu.id), key=lambda submenu: submenu.id):
+            export_rows.append(['', submenu.id, submenu.title, submenu.description, '', ''])
+
+            for dish in sorted(await repo.read_dishes(submenu.id), key=lambda dish: dish.id):
+                export_rows.append(['', '', dish.id, dish.title, dish.description, dish.price])
+
+    return make_csv_text(export_rows)
+
+
+async def export_outer_join(db: AsyncSession) -> str:
+    return ''.join([chunk async for chunk in restaurant_menu_export(db)])
+
+
+async def measure(
+    name: str,
+    export: Callable[[AsyncSession], Awaitable[str]],
+    session_factory: sessionmaker,
+    repeats: int,
+) -> None:
+    timings = []
+
+    for _ in range(repeats):
+        async with session_factory() as db:
+            started_at = time.perf_counter()
+            body = await export(db)
+            timings.append(time.perf_counter() - started_at)
+
+    rows_count = body.count('\n') + 1 if body else 0
+    print(f'{name:<20} best {min(timings) * 1000:8.1f} ms, rows {rows_count}')
+
+
+async def main(database_url: str, menus_count: int, repeats: int) -> None:
+    engine = create_async_engine(database_url, poolclass=NullPool)
+    await migrate(engine)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_factory() as db:
+        await insert_sparse_catalog(db, menus_count)
+
+    try:
+        await measure('inner join', export_inner_join, session_factory, repeats)
+        await measure('per-menu queries', export_per_menu_queries, session_factory, repeats)
+        await measure('outer join', export_outer_join, session_factory, repeats)
+    finally:
+        async with session_factory() as db:
+            await db.execute(text('DELETE FROM menus'))
+            await db.commit()
+
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--menus', type=int, default=500)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    if not BENCHMARK_DATABASE_URL:
+        parser.error('set BENCHMARK_DATABASE_URL to a disposable database, all menus are deleted')
+    if BENCHMARK_DATABASE_URL == SQLALCHEMY_DATABASE_URL:
+        parser.error('BENCHMARK_DATABASE_URL points to the application database')
+
+    asyncio.run(main(BENCHMARK_DATABASE_URL, args.menus, args.repeats))
@@ -0,0 +1,131 @@
+"""Dish primary keys: random uuid4 vs. time-ordered UUIDv7.
+
+Loads the same number of dishes into two scratch tables, one per key kind, and
+reports insert throughput, primary key index size and the time of a full scan
+in key order (the order the export reads in). Keys are generated by the application
+before the timer starts, so only the inserts are measured; --server-side generates
+them with gen_random_uuid() and uuid_generate_v7() instead:
+
+    poetry run python -m benchmarks.uuid_keys --dishes 1000000 [--server-side]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from collections.abc import Callable
+from uuid import UUID
+
+from menu_app.database import SQLALCHEMY_DATABASE_URL
+from menu_app.models.ids import UUID7_FUNCTION, uuid7
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+KEY_GENERATORS: dict[str, Callable[[], UUID]] = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+KEY_FUNCTIONS: dict[str, str] = {
+    'uuid4': 'gen_random_uuid()',
+    'uuid7': 'uuid_generate_v7()',
+}
+
+
+async def create_table(conn: AsyncConnection, table_name: str) -> None:
+    await conn.execute(text(f'DROP TABLE IF EXISTS {table_name}'))
+    await conn.execute(
+        text(
+            f'CREATE TABLE {table_name} ( \
+            id uuid PRIMARY KEY, \
+            submenu_id uuid, \
+            title varchar, \
+            description varchar, \
+            price numeric(10, 2))'
+        ),
+    )
+
+
+async def measure(
+    conn: AsyncConnection,
+    key_kind: str,
+    dishes_count: int,
+    batch_size: int,
+    server_side: bool,
+) -> None:
+    table_name = f'benchmark_dishes_{key_kind}'
+    await create_table(conn, table_name)
+
+    insert_time = 0.0
+
+    # Соединение в autocommit: пачка - одна транзакция, как при импорте
+    for batch_start in range(0, dishes_count, batch_size):
+        batch_end = min(batch_start + batch_size, dishes_count)
+
+        if server_side:
+            statement = text(
+                f"INSERT INTO {table_name} (id, submenu_id, title, description, price) \
+                SELECT {KEY_FUNCTIONS[key_kind]}, gen_random_uuid(), \
+                'Блюдо ' || n, 'Описание', 9.99 \
+                FROM generate_series(CAST(:first AS integer), CAST(:last AS integer)) AS n"
+            )
+            parameters = {'first': batch_start + 1, 'last': batch_end}
+        else:
+            statement = text(
+                f"INSERT INTO {table_name} (id, submenu_id, title, description, price) \
+                SELECT id, gen_random_uuid(), 'Блюдо ' || n, 'Описание', 9.99 \
+                FROM unnest(CAST(:ids AS uuid[])) WITH ORDINALITY AS keys (id, n)"
+            )
+            parameters = {
+                'ids': [KEY_GENERATORS[key_kind]() for _ in range(batch_end - batch_start)],
+            }
+
+        started_at = time.perf_counter()
+        await conn.execute(statement, parameters)
+        insert_time += time.perf_counter() - started_at
+
+    await conn.execute(text(f'VACUUM ANALYZE {table_name}'))
+    result = await conn.execute(
+        text(f"SELECT pg_relation_size('{table_name}_pkey')"),
+    )
+    index_size = result.scalar()
+
+    started_at = time.perf_counter()
+    await conn.execute(text('SET enable_seqscan = off'))
+    await conn.execute(text(f'SELECT count(*) FROM (SELECT id FROM {table_name} ORDER BY id) AS s'))
+    await conn.execute(text('SET enable_seqscan = on'))
+    scan_time = time.perf_counter() - started_at
+
+    await conn.execute(text(f'DROP TABLE {table_name}'))
+
+    print(
+        f'{key_kind:<6} {dishes_count / insert_time:10.0f} rows/s, '
+        f'pkey {index_size / 1024 / 1024:7.1f} MiB, '
+        f'ordered scan {scan_time * 1000:8.1f} ms',
+    )
+
+
+async def main(dishes_count: int, batch_size: int, server_side: bool) -> None:
+    # VACUUM не работает внутри транзакции
+    engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL,
+        poolclass=NullPool,
+        isolation_level='AUTOCOMMIT',
+    )
+
+    async with engine.connect() as conn:
+        await conn.execute(UUID7_FUNCTION)
+
+        for key_kind in KEY_FUNCTIONS:
+            await measure(conn, key_kind, dishes_count, batch_size, server_side)
+
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=10_000)
+    parser.add_argument('--server-side', action='store_true')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.dishes, args.batch, args.server_side))
@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+
+from menu_app.migrations import migrate
+from menu_app.restaurant_service import recount_counters, warm_up_cache
+
+
+async def run_migrate() -> None:
+    applied_migrations = await migrate()
+    print(f'Schema migrated. Applied migrations: {applied_migrations}')
+
+
+async def run_warmup() -> None:
+    warmed_keys = await warm_up_cache()
+    print(f'Cache warmed up. Keys: {warmed_keys}')
+
+
+async def run_recount() -> None:
+    fixed_rows = await recount_counters()
+    print(f'Counters recounted. Fixed rows: {fixed_rows}')
+
+
+COMMANDS = {
+    'migrate': run_migrate,
+    'warmup': run_warmup,
+    'recount': run_recount,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='menu-app')
+    parser.add_argument('command', choices=COMMANDS)
+    args = parser.parse_args()
+
+    asyncio.run(COMMANDS[args.command]())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,24 @@
+import asyncio
+import itertools
 import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
 
 import dotenv
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql import Select, text
 
 dotenv.load_dotenv()
 
@@ -13,20 +28,227 @@ POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
 POSTGRES_DB = os.getenv('POSTGRES_DB')
 SQLALCHEMY_DATABASE_URL = f'postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:5432/{POSTGRES_DB}'  # noqa: E501
 
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+# Профиль движка. Каждый воркер держит свой пул, поэтому
+# воркеры * (DB_POOL_SIZE + DB_MAX_OVERFLOW) не должно превышать max_connections
+DB_POOL_SIZE: int = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW: int = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT: float = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+# Соединение проверяется перед выдачей из пула и пересоздается
+# раньше, чем его закроет сервер или балансировщик
+DB_POOL_PRE_PING: bool = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+DB_POOL_RECYCLE: int = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+# Миллисекунды; 0 - без ограничения
+DB_STATEMENT_TIMEOUT: int = int(os.getenv('DB_STATEMENT_TIMEOUT', '30000'))
+# Подготовленные выражения asyncpg на одно соединение; 0 - без кэша,
+# нужно за pgbouncer в режиме transaction
+DB_STATEMENT_CACHE_SIZE: int = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '100'))
+# Лог каждого запроса пишется синхронно в event loop, поэтому выключен
+DB_ECHO: bool = os.getenv('DB_ECHO', '0') == '1'
+# Первичные ключи создает БД, а не приложение
+DB_SERVER_SIDE_IDS: bool = os.getenv('DB_SERVER_SIDE_IDS', '0') == '1'
+
+# Реплики для чтения: полные URL через запятую; без них все идет в основную БД
+DB_REPLICA_URLS: list[str] = [
+    url.strip()
+    for url in os.getenv('DB_REPLICA_URLS', '').split(',')
+    if url.strip()
+]
+DB_REPLICA_CHECK_INTERVAL: float = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '5'))
+DB_REPLICA_CHECK_TIMEOUT: float = float(os.getenv('DB_REPLICA_CHECK_TIMEOUT', '2'))
+# После записи клиент читает из основной БД, пока реплики догоняют ее
+DB_REPLICA_STICKY_SECONDS: int = int(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
+
+
+class PoolStats:
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.acquires = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+
+    def record_wait(self, wait_time: float) -> None:
+        self.acquires += 1
+        self.wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            'checkouts': self.checkouts,
+            'acquires': self.acquires,
+            'wait_time': self.wait_time,
+            'max_wait_time': self.max_wait_time,
+            'avg_wait_time': self.wait_time / self.acquires if self.acquires else 0,
+            'timeouts': self.timeouts,
+        }
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    # Замеряет ожидание свободного соединения: у пула нет события для этого.
+    # Счетчики свои у каждого пула - основной БД и каждой реплики
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self) -> 'MeteredQueuePool':
+        # dispose() пересоздает пул, счетчики переходят в новый
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self) -> Any:
+        started_at = time.perf_counter()
+
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.record_wait(time.perf_counter() - started_at)
+
+
+def make_engine(url: str) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        echo=DB_ECHO,
+        poolclass=MeteredQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+        connect_args={
+            'prepared_statement_cache_size': DB_STATEMENT_CACHE_SIZE,
+            'server_settings': {'statement_timeout': str(DB_STATEMENT_TIMEOUT)},
+        },
+    )
+    stats = engine.sync_engine.pool.stats
+
+    @event.listens_for(engine.sync_engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+        stats.checkouts += 1
+
+    return engine
+
+
+# Чтение из основной БД в рамках текущего запроса
+read_from_primary: ContextVar[bool] = ContextVar('read_from_primary', default=False)
+
+
+@contextmanager
+def reading_from_primary() -> Iterator[None]:
+    # Чтение из основной БД вне запроса, где нет куки после записи
+    token = read_from_primary.set(True)
+    try:
+        yield
+    finally:
+        read_from_primary.reset(token)
+
+
+class ReplicaSet:
+    def __init__(self, engines: list[AsyncEngine]) -> None:
+        self.engines = engines
+        self.healthy = list(engines)
+        self.position = itertools.count()
+
+    def next_engine(self) -> AsyncEngine | None:
+        # Round-robin по живым репликам
+        healthy = self.healthy
+        if not healthy:
+            return None
+
+        return healthy[next(self.position) % len(healthy)]
+
+    async def ping(self, engine: AsyncEngine) -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text('SELECT 1'))
+
+    async def check_health(self) -> None:
+        healthy = []
+
+        for engine in self.engines:
+            try:
+                await asyncio.wait_for(self.ping(engine), DB_REPLICA_CHECK_TIMEOUT)
+            except Exception:
+                # Любая ошибка соединения выводит реплику из ротации до следующей проверки
+                continue
+
+            healthy.append(engine)
+
+        self.healthy = healthy
+
+    async def monitor_health(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(DB_REPLICA_CHECK_INTERVAL)
+
+
+class RoutingSession(Session):
+    # SELECT уходят в реплику, все остальное - в основную БД.
+    # После первой записи сессия до конца читает из основной БД,
+    # а одна сессия читает из одной реплики
+    def __init__(self, replicas: ReplicaSet | None = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.replicas = replicas
+        self.replica: AsyncEngine | None = None
+        self.wrote = False
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Engine:
+        if isinstance(clause, Select) and not self.wrote and not self._flushing:
+            replica = self.get_replica()
+            if replica is not None:
+                return replica.sync_engine
+        elif clause is not None:
+            self.wrote = True
+
+        return super().get_bind(mapper, clause, **kwargs)
+
+    def get_replica(self) -> AsyncEngine | None:
+        if self.replicas is None or read_from_primary.get():
+            return None
+
+        if self.replica is None:
+            self.replica = self.replicas.next_engine()
+
+        return self.replica
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
+replicas: ReplicaSet = ReplicaSet([make_engine(url) for url in DB_REPLICA_URLS])
+
 async_session = sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    replicas=replicas,
     expire_on_commit=False,
 )
 
-Base = declarative_base()
 
+def get_engine_stats(engine: AsyncEngine) -> dict[str, float]:
+    pool = engine.sync_engine.pool
 
-async def init_models() -> None:
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+    return {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': pool.overflow(),
+        **pool.stats.as_dict(),
+    }
+
+
+def get_pool_stats() -> dict[str, Any]:
+    # Поля верхнего уровня - пул основной БД, у каждой реплики - свой
+    return {
+        **get_engine_stats(engine),
+        'replicas': len(replicas.engines),
+        'replicas_healthy': len(replicas.healthy),
+        'replica_pools': [get_engine_stats(replica) for replica in replicas.engines],
+    }
+
+
+Base = declarative_base()
 
 
 async def get_db() -> AsyncSession:
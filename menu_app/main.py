@@ -1,50 +1,177 @@
+import asyncio
+import os
+from typing import Any
 from uuid import UUID
 
-from fastapi import BackgroundTasks, Depends, FastAPI, status
-from fastapi.responses import PlainTextResponse
-from menu_app.database import get_db, init_models
-from menu_app.restaurant_export import restaurant_menu_export
+from fastapi import (
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    status,
+)
+from fastapi.responses import Response, StreamingResponse
+from menu_app.database import (
+    DB_REPLICA_STICKY_SECONDS,
+    get_db,
+    get_pool_stats,
+    read_from_primary,
+    replicas,
+)
+from menu_app.migrations import check_schema_version, migrate
+from menu_app.redis_cache import CacheEntry, RedisCache, is_not_modified
+from menu_app.redis_cache import stats as cache_stats
+from menu_app.restaurant_export import (
+    EXPORT_MEDIA_TYPES,
+    EXPORT_WRITERS,
+    ExportFormat,
+    is_export_format_available,
+    parse_catalog_tsv,
+    read_export_snapshot,
+)
 from menu_app.restaurant_repo import RestaurantRepository
-from menu_app.restaurant_service import RestaurantService
+from menu_app.restaurant_service import (
+    PAGE_LIMIT_MAX,
+    RestaurantService,
+    warm_up_cache,
+)
+from menu_app.schemas import catalog as catalog_schema
 from menu_app.schemas import dish as dish_schema
 from menu_app.schemas import menu as menu_schema
 from menu_app.schemas import submenu as submenu_schema
+from pydantic import parse_obj_as
 from sqlalchemy.ext.asyncio import AsyncSession
 
 app: FastAPI = FastAPI()
 
+# Кэш при старте прогревает один воркер деплоя, остальные ждут его метку готовности.
+# Все воркеры принимают запросы после прогрева или по истечении таймаута
+CACHE_WARMUP_ENABLED: bool = os.getenv('CACHE_WARMUP_ENABLED', '1') == '1'
+CACHE_WARMUP_TIMEOUT: float = float(os.getenv('CACHE_WARMUP_TIMEOUT', '30'))
+# TSV-экспорт отдается из снимка в Redis, остальные форматы - потоком из БД
+EXPORT_SNAPSHOT_ENABLED: bool = os.getenv('EXPORT_SNAPSHOT_ENABLED', '1') == '1'
+# Схему создает menu-app migrate один раз за деплой, воркер только сверяет версию.
+# Миграция при старте - для запуска одним процессом без отдельного шага деплоя
+DB_MIGRATE_ON_STARTUP: bool = os.getenv('DB_MIGRATE_ON_STARTUP', '0') == '1'
+# Кука клиента, который недавно писал: его чтения идут в основную БД
+READ_PRIMARY_COOKIE: str = 'read_primary'
 
-@app.on_event('startup')
-async def on_startup() -> None:
-    await init_models()
+
+background_tasks: set[asyncio.Task] = set()
 
 
-def get_repo(db: AsyncSession = Depends(get_db)) -> RestaurantRepository:
+@app.on_event('startup')
+async def on_startup() -> None:
+    if DB_MIGRATE_ON_STARTUP:
+        await migrate()
+    else:
+        await check_schema_version()
+
+    await RedisCache.configure_memory_policy()
+
+    if CACHE_WARMUP_ENABLED:
+        await warm_up_on_startup()
+
+    background_tasks.add(
+        asyncio.create_task(RedisCache.listen_invalidations()),
+    )
+
+    if replicas.engines:
+        background_tasks.add(asyncio.create_task(replicas.monitor_health()))
+
+
+async def warm_up_on_startup() -> None:
+    # Без прогрева воркер все равно стартует: кэш заполнится чтениями
+    try:
+        if await RedisCache.claim_warmup():
+            await run_claimed_warmup()
+        elif await RedisCache.wait_for_warmup(CACHE_WARMUP_TIMEOUT):
+            print('Cache is warmed up by another worker')
+        else:
+            print('Cache is not warmed up by another worker, starting cold')
+    except asyncio.TimeoutError:
+        print('Cache warm-up timed out, starting cold')
+    except Exception as error:
+        print(f'Cache warm-up failed, starting cold: {error!r}')
+
+
+async def run_claimed_warmup() -> None:
+    # Заявка снимается при ошибке и таймауте: ожидающие воркеры не ждут зря,
+    # а следующий старт попробует прогреть кэш снова
+    try:
+        warmed_keys = await asyncio.wait_for(warm_up_cache(), CACHE_WARMUP_TIMEOUT)
+    except Exception:
+        await RedisCache.release_warmup()
+        raise
+
+    await RedisCache.finish_warmup()
+    print(f'Cache warmed up. Keys: {warmed_keys}')
+
+
+@app.on_event('shutdown')
+async def on_shutdown() -> None:
+    for task in background_tasks:
+        task.cancel()
+
+
+async def route_reads(request: Request, response: Response) -> None:
+    # async: контекстная переменная должна остаться в задаче запроса
+    if request.method in ('GET', 'HEAD'):
+        read_from_primary.set(READ_PRIMARY_COOKIE in request.cookies)
+    elif replicas.engines:
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            '1',
+            max_age=DB_REPLICA_STICKY_SECONDS,
+            httponly=True,
+        )
+
+
+def get_repo(
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(route_reads),
+) -> RestaurantRepository:
     return RestaurantRepository(db)
 
 
 def get_service(
-    bg_tasks: BackgroundTasks,
     repo: RestaurantRepository = Depends(get_repo),
 ) -> RestaurantService:
-    return RestaurantService(repo, bg_tasks)
+    return RestaurantService(repo)
+
+
+def make_json_response(entry: CacheEntry, if_none_match: str | None = None) -> Response:
+    # Тело уже сериализовано кэшем, повторная валидация по response_model не нужна.
+    # ETag посчитан при записи в кэш, поэтому 304 отдается без хеширования тела
+    headers = {'ETag': entry.etag}
+
+    if is_not_modified(entry.etag, if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=entry.body, media_type='application/json', headers=headers)
 
 
 # Menu handlers
 
-@app.get('/api/v1/menus')
+@app.get('/api/v1/menus', response_model=list[menu_schema.Menu])
 async def read_menus(
+    limit: int | None = Query(None, ge=1, le=PAGE_LIMIT_MAX),
+    after: UUID | None = None,
+    if_none_match: str | None = Header(None),
     svc: RestaurantService = Depends(get_service),
-) -> list[menu_schema.Menu]:
-    return await svc.read_menus()
+) -> Response:
+    return make_json_response(await svc.read_menus(limit, after), if_none_match)
 
 
-@app.get('/api/v1/menus/{menu_id}')
+@app.get('/api/v1/menus/{menu_id}', response_model=menu_schema.Menu)
 async def read_menu(
     menu_id: UUID,
+    if_none_match: str | None = Header(None),
     svc: RestaurantService = Depends(get_service),
-) -> menu_schema.Menu:
-    return await svc.read_menu(menu_id)
+) -> Response:
+    return make_json_response(await svc.read_menu(menu_id), if_none_match)
 
 
 @app.post('/api/v1/menus', status_code=status.HTTP_201_CREATED)
@@ -74,21 +201,37 @@ async def delete_menu(
 
 # Submenu handlers
 
-@app.get('/api/v1/menus/{menu_id}/submenus')
+@app.get(
+    '/api/v1/menus/{menu_id}/submenus',
+    response_model=list[submenu_schema.Submenu],
+)
 async def read_submenus(
     menu_id: UUID,
+    limit: int | None = Query(None, ge=1, le=PAGE_LIMIT_MAX),
+    after: UUID | None = None,
+    if_none_match: str | None = Header(None),
     svc: RestaurantService = Depends(get_service),
-) -> list[submenu_schema.Submenu]:
-    return await svc.read_submenus(menu_id)
+) -> Response:
+    return make_json_response(
+        await svc.read_submenus(menu_id, limit, after),
+        if_none_match,
+    )
 
 
-@app.get('/api/v1/menus/{menu_id}/submenus/{submenu_id}')
+@app.get(
+    '/api/v1/menus/{menu_id}/submenus/{submenu_id}',
+    response_model=submenu_schema.Submenu,
+)
 async def read_submenu(
     menu_id: UUID,
     submenu_id: UUID,
+    if_none_match: str | None = Header(None),
     svc: RestaurantService = Depends(get_service),
-) -> submenu_schema.Submenu:
-    return await svc.read_submenu(menu_id, submenu_id)
+) -> Response:
+    return make_json_response(
+        await svc.read_submenu(menu_id, submenu_id),
+        if_none_match,
+    )
 
 
 @app.post(
@@ -124,23 +267,39 @@ async def delete_submenu(
 
 # Dish handlers
 
-@app.get('/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes')
+@app.get(
+    '/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes',
+    response_model=list[dish_schema.Dish],
+)
 async def read_dishes(
     menu_id: UUID,
     submenu_id: UUID,
+    limit: int | None = Query(None, ge=1, le=PAGE_LIMIT_MAX),
+    after: UUID | None = None,
+    if_none_match: str | None = Header(None),
     svc: RestaurantService = Depends(get_service),
-) -> list[dish_schema.Dish]:
-    return await svc.read_dishes(menu_id, submenu_id)
+) -> Response:
+    return make_json_response(
+        await svc.read_dishes(menu_id, submenu_id, limit, after),
+        if_none_match,
+    )
 
 
-@app.get('/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}')
+@app.get(
+    '/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}',
+    response_model=dish_schema.Dish,
+)
 async def read_dish(
     menu_id: UUID,
     submenu_id: UUID,
     dish_id: UUID,
+    if_none_match: str | None = Header(None),
     svc: RestaurantService = Depends(get_service),
-) -> dish_schema.Dish:
-    return await svc.read_dish(menu_id, submenu_id, dish_id)
+) -> Response:
+    return make_json_response(
+        await svc.read_dish(menu_id, submenu_id, dish_id),
+        if_none_match,
+    )
 
 
 @app.post(
@@ -156,6 +315,16 @@ async def create_dish(
     return await svc.create_dish(menu_id, submenu_id, dish)
 
 
+@app.post('/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/batch')
+async def apply_dish_batch(
+    menu_id: UUID,
+    submenu_id: UUID,
+    batch: dish_schema.DishBatch,
+    svc: RestaurantService = Depends(get_service),
+) -> dish_schema.DishBatchResult:
+    return await svc.apply_dish_batch(menu_id, submenu_id, batch)
+
+
 @app.patch('/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}')
 async def update_dish(
     menu_id: UUID,
@@ -179,6 +348,88 @@ async def delete_dish(
 
 # Export handler
 
-@app.get('/api/v1/export', response_class=PlainTextResponse)
-async def export(db: AsyncSession = Depends(get_db)) -> str:
-    return await restaurant_menu_export(db)
+@app.get('/api/v1/export', response_class=StreamingResponse)
+async def export(
+    format: ExportFormat = ExportFormat.tsv,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(route_reads),
+) -> Response:
+    if format == ExportFormat.tsv and EXPORT_SNAPSHOT_ENABLED:
+        etag, body = await read_export_snapshot(db, if_none_match)
+
+        if body is None:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag},
+            )
+
+        return StreamingResponse(
+            body,
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={'ETag': etag},
+        )
+
+    if not is_export_format_available(format):
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f'{format.value} export is not installed',
+        )
+
+    headers = {}
+    if format != ExportFormat.tsv:
+        headers['Content-Disposition'] = f'attachment; filename="menu.{format.value}"'
+
+    # Сессия из get_db закрывается после отправки ответа,
+    # поэтому курсор живет все время стриминга
+    return StreamingResponse(
+        EXPORT_WRITERS[format](db),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=headers,
+    )
+
+
+# Import handler
+
+@app.post('/api/v1/import', status_code=status.HTTP_201_CREATED)
+async def import_catalog(
+    request: Request,
+    svc: RestaurantService = Depends(get_service),
+) -> catalog_schema.CatalogImportResult:
+    # Дерево меню в JSON или TSV в раскладке экспорта
+    content_type = request.headers.get('content-type', '')
+
+    try:
+        if content_type.startswith(('text/tab-separated-values', 'text/plain')):
+            catalog = parse_catalog_tsv((await request.body()).decode())
+        else:
+            catalog = parse_obj_as(
+                catalog_schema.CatalogImport,
+                await request.json(),
+            )
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(error),
+        )
+
+    return await svc.import_catalog(catalog)
+
+
+# Cache handlers
+
+@app.get('/api/v1/cache/stats')
+async def read_cache_stats() -> dict[str, float]:
+    return cache_stats.as_dict()
+
+
+@app.get('/api/v1/cache/memory')
+async def read_cache_memory() -> dict[str, Any]:
+    return await RedisCache.get_memory_stats()
+
+
+# Database handlers
+
+@app.get('/api/v1/db/pool')
+async def read_db_pool_stats() -> dict[str, Any]:
+    return get_pool_stats()
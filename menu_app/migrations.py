@@ -0,0 +1,198 @@
+from collections.abc import Callable
+
+from menu_app.database import engine
+from menu_app.models.ids import UUID7_FUNCTION
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.sql import text
+
+# Миграции применяются один раз за деплой командой menu-app migrate,
+# а воркеры при старте только сверяют версию схемы.
+# Новая миграция дописывается в конец списка, старые не меняются
+
+# Ключ advisory-блокировки: параллельные запуски ждут друг друга, а не гоняются на DDL
+MIGRATION_LOCK_ID: int = 7_301_865
+
+
+# Исходная схема записана текстом, а не берется из моделей:
+# изменения моделей не должны менять уже примененную миграцию.
+# По одной команде на элемент - asyncpg не выполняет несколько команд за запрос.
+# Таблицы без schema_version остались от create_all прежних версий: в них нет
+# счетчиков, а прежнее приложение и так очищало их при каждом старте
+BASELINE_DDL: list[str] = [
+    'DROP TABLE IF EXISTS dishes, submenus, menus CASCADE',
+    '''
+    CREATE TABLE menus (
+        id UUID NOT NULL,
+        title VARCHAR,
+        description VARCHAR,
+        submenus_count INTEGER DEFAULT '0' NOT NULL,
+        dishes_count INTEGER DEFAULT '0' NOT NULL,
+        PRIMARY KEY (id)
+    )
+    ''',
+    'CREATE UNIQUE INDEX ix_menus_title ON menus (title)',
+    '''
+    CREATE TABLE submenus (
+        id UUID NOT NULL,
+        title VARCHAR,
+        description VARCHAR,
+        menu_id UUID,
+        dishes_count INTEGER DEFAULT '0' NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY (menu_id) REFERENCES menus (id) ON DELETE CASCADE
+    )
+    ''',
+    'CREATE INDEX ix_submenus_menu_id ON submenus (menu_id)',
+    'CREATE UNIQUE INDEX ix_submenus_title ON submenus (title)',
+    '''
+    CREATE TABLE dishes (
+        id UUID NOT NULL,
+        title VARCHAR,
+        description VARCHAR,
+        price NUMERIC(10, 2),
+        submenu_id UUID,
+        PRIMARY KEY (id),
+        FOREIGN KEY (submenu_id) REFERENCES submenus (id) ON DELETE CASCADE
+    )
+    ''',
+    'CREATE INDEX ix_dishes_submenu_id ON dishes (submenu_id)',
+    'CREATE UNIQUE INDEX ix_dishes_title ON dishes (title)',
+    '''
+    CREATE OR REPLACE FUNCTION update_menu_submenus_count() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.menu_id IS NOT DISTINCT FROM NEW.menu_id THEN
+            RETURN NULL;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE menus
+            SET submenus_count = submenus_count + 1,
+                dishes_count = dishes_count + NEW.dishes_count
+            WHERE id = NEW.menu_id;
+        END IF;
+
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE menus
+            SET submenus_count = submenus_count - 1,
+                dishes_count = dishes_count - OLD.dishes_count
+            WHERE id = OLD.menu_id;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER submenus_count
+    AFTER INSERT OR DELETE OR UPDATE OF menu_id ON submenus
+    FOR EACH ROW EXECUTE FUNCTION update_menu_submenus_count()
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION update_submenu_dishes_count() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.submenu_id IS NOT DISTINCT FROM NEW.submenu_id THEN
+            RETURN NULL;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE submenus SET dishes_count = dishes_count + 1
+            WHERE id = NEW.submenu_id;
+
+            UPDATE menus SET dishes_count = dishes_count + 1
+            WHERE id = (SELECT menu_id FROM submenus WHERE id = NEW.submenu_id);
+        END IF;
+
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE submenus SET dishes_count = dishes_count - 1
+            WHERE id = OLD.submenu_id;
+
+            UPDATE menus SET dishes_count = dishes_count - 1
+            WHERE id = (SELECT menu_id FROM submenus WHERE id = OLD.submenu_id);
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER dishes_count
+    AFTER INSERT OR DELETE OR UPDATE OF submenu_id ON dishes
+    FOR EACH ROW EXECUTE FUNCTION update_submenu_dishes_count()
+    ''',
+]
+
+
+def create_baseline(conn: Connection) -> None:
+    # Исходная схема: таблицы, индексы и триггеры счетчиков.
+    # Таблицы прежних версий без счетчиков пересоздаются
+    for statement in BASELINE_DDL:
+        conn.exec_driver_sql(statement)
+
+
+def add_uuid7_defaults(conn: Connection) -> None:
+    # Ключи по умолчанию - UUIDv7 из БД
+    conn.execute(UUID7_FUNCTION)
+
+    for table_name in ('menus', 'submenus', 'dishes'):
+        conn.execute(
+            text(f'ALTER TABLE {table_name} ALTER COLUMN id SET DEFAULT uuid_generate_v7()'),
+        )
+
+
+MIGRATIONS: list[Callable[[Connection], None]] = [
+    create_baseline,
+    add_uuid7_defaults,
+]
+SCHEMA_VERSION: int = len(MIGRATIONS)
+
+
+async def read_schema_version(conn: AsyncConnection) -> int:
+    # to_regclass не бросает ошибку на пустой БД и не ломает транзакцию
+    result = await conn.execute(text("SELECT to_regclass('schema_version')"))
+    if result.scalar() is None:
+        return 0
+
+    result = await conn.execute(text('SELECT max(version) FROM schema_version'))
+    return result.scalar() or 0
+
+
+async def migrate(db_engine: AsyncEngine = engine) -> int:
+    # Все миграции - одной транзакцией: DDL в Postgres транзакционен.
+    # Ограничение времени запроса из профиля движка снимается на эту транзакцию:
+    # DDL на большой таблице и ожидание блокировки могут идти дольше
+    async with db_engine.begin() as conn:
+        await conn.execute(text('SET LOCAL statement_timeout = 0'))
+        await conn.execute(
+            text('SELECT pg_advisory_xact_lock(:lock_id)'),
+            {'lock_id': MIGRATION_LOCK_ID},
+        )
+
+        version = await read_schema_version(conn)
+
+        for migration in MIGRATIONS[version:]:
+            await conn.run_sync(migration)
+
+        await conn.execute(
+            text('CREATE TABLE IF NOT EXISTS schema_version (version integer NOT NULL)'),
+        )
+        await conn.execute(text('DELETE FROM schema_version'))
+        await conn.execute(
+            text('INSERT INTO schema_version (version) VALUES (:version)'),
+            {'version': max(version, SCHEMA_VERSION)},
+        )
+
+    return max(SCHEMA_VERSION - version, 0)
+
+
+async def check_schema_version(db_engine: AsyncEngine = engine) -> None:
+    # Один дешевый запрос при старте воркера. Схема новее кода допустима:
+    # так работают старые воркеры во время выкатки
+    async with db_engine.connect() as conn:
+        version = await read_schema_version(conn)
+
+    if version < SCHEMA_VERSION:
+        raise RuntimeError(
+            f'Database schema version is {version}, expected {SCHEMA_VERSION}. '
+            'Run menu-app migrate',
+        )
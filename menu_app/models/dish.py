@@ -1,7 +1,6 @@
-import uuid
-
 from menu_app.database import Base
-from sqlalchemy import Column, ForeignKey, Numeric, String
+from menu_app.models.ids import ID_DEFAULT, ID_SERVER_DEFAULT
+from sqlalchemy import DDL, Column, ForeignKey, Numeric, String, event
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -9,7 +8,12 @@ from sqlalchemy.orm import relationship
 class Dish(Base):
     __tablename__: str = 'dishes'
 
-    id: Column[UUID] = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Column[UUID] = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=ID_DEFAULT,
+        server_default=ID_SERVER_DEFAULT,
+    )
     title: Column[String] = Column(String, unique=True, index=True)
     description: Column[String] = Column(String)
     price: Column[Numeric] = Column(Numeric(10, 2))
@@ -17,5 +21,46 @@ class Dish(Base):
     submenu_id: Column[UUID] = Column(
         UUID(as_uuid=True),
         ForeignKey('submenus.id', ondelete='CASCADE'),
+        index=True,
     )
     submenu: relationship = relationship('Submenu', back_populates='dishes')
+
+
+# Поддерживает submenus.dishes_count и menus.dishes_count
+DISHES_COUNT_FUNCTION: DDL = DDL('''
+CREATE OR REPLACE FUNCTION update_submenu_dishes_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.submenu_id IS NOT DISTINCT FROM NEW.submenu_id THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE submenus SET dishes_count = dishes_count + 1
+        WHERE id = NEW.submenu_id;
+
+        UPDATE menus SET dishes_count = dishes_count + 1
+        WHERE id = (SELECT menu_id FROM submenus WHERE id = NEW.submenu_id);
+    END IF;
+
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE submenus SET dishes_count = dishes_count - 1
+        WHERE id = OLD.submenu_id;
+
+        UPDATE menus SET dishes_count = dishes_count - 1
+        WHERE id = (SELECT menu_id FROM submenus WHERE id = OLD.submenu_id);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+''')
+
+DISHES_COUNT_TRIGGER: DDL = DDL('''
+CREATE TRIGGER dishes_count
+AFTER INSERT OR DELETE OR UPDATE OF submenu_id ON dishes
+FOR EACH ROW EXECUTE FUNCTION update_submenu_dishes_count()
+''')
+
+# asyncpg выполняет по одной команде за запрос, поэтому функция и триггер разделены
+event.listen(Dish.__table__, 'after_create', DISHES_COUNT_FUNCTION)
+event.listen(Dish.__table__, 'after_create', DISHES_COUNT_TRIGGER)
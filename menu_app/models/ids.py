@@ -0,0 +1,74 @@
+import secrets
+import time
+from collections.abc import Callable
+from uuid import UUID
+
+from menu_app.database import DB_SERVER_SIDE_IDS, Base
+from sqlalchemy import DDL, event
+from sqlalchemy.sql import text
+
+# Первичные ключи - UUIDv7 (RFC 9562): старшие 48 бит - миллисекунды Unix,
+# поэтому новые ключи попадают в правый край B-дерева, а не в случайную страницу
+
+
+class Uuid7Generator:
+    # Внутри одной миллисекунды 12 бит rand_a работают как счетчик,
+    # поэтому ключи одного процесса строго возрастают
+    def __init__(self) -> None:
+        self.timestamp = 0
+        self.sequence = 0
+
+    def __call__(self) -> UUID:
+        timestamp = time.time_ns() // 1_000_000
+
+        if timestamp > self.timestamp:
+            self.timestamp = timestamp
+            self.sequence = secrets.randbits(11)
+        else:
+            self.sequence += 1
+
+            if self.sequence > 0xFFF:
+                self.timestamp += 1
+                self.sequence = secrets.randbits(11)
+
+        # Поля слева направо: unix_ts_ms, версия, rand_a (счетчик), вариант, rand_b
+        value = self.timestamp << 80
+        value |= 0x7 << 76
+        value |= self.sequence << 64
+        value |= 0b10 << 62
+        value |= secrets.randbits(62)
+
+        return UUID(int=value)
+
+
+uuid7: Uuid7Generator = Uuid7Generator()
+
+# Тот же формат на стороне БД, 28672 = 0x7000 - версия.
+# Вместо счетчика в rand_a - доли миллисекунды, как в uuidv7() Postgres 18:
+# со случайным rand_a ключи одной миллисекунды делят страницы пополам,
+# и индекс выходит больше, чем с uuid4
+UUID7_FUNCTION: DDL = DDL('''
+CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+DECLARE
+    epoch_us bigint := floor(date_part('epoch', clock_timestamp()) * 1000000);
+BEGIN
+    RETURN encode(
+        overlay(
+            uuid_send(gen_random_uuid())
+            PLACING substring(int8send(epoch_us / 1000) FROM 3)
+                || substring(int4send(28672 | ((epoch_us %% 1000) * 4096 / 1000)::integer) FROM 3)
+            FROM 1 FOR 8
+        ),
+        'hex'
+    )::uuid;
+END;
+$$ LANGUAGE plpgsql VOLATILE
+''')
+
+# Функция нужна до таблиц: на нее ссылается DEFAULT столбцов id
+event.listen(Base.metadata, 'before_create', UUID7_FUNCTION)
+
+# С DB_SERVER_SIDE_IDS id не передается в INSERT и создается DEFAULT в БД,
+# а приложение получает его через RETURNING
+ID_DEFAULT: Callable[[], UUID] | None = None if DB_SERVER_SIDE_IDS else uuid7
+ID_SERVER_DEFAULT = text('uuid_generate_v7()')
@@ -1,17 +1,19 @@
-import uuid
-
 from menu_app.database import Base
-from menu_app.models.dish import Dish
-from menu_app.models.submenu import Submenu
-from sqlalchemy import Column, String, func, select
+from menu_app.models.ids import ID_DEFAULT, ID_SERVER_DEFAULT
+from sqlalchemy import Column, Integer, String
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import column_property, relationship
+from sqlalchemy.orm import relationship
 
 
 class Menu(Base):
     __tablename__: str = 'menus'
 
-    id: Column[UUID] = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Column[UUID] = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=ID_DEFAULT,
+        server_default=ID_SERVER_DEFAULT,
+    )
     title: Column[String] = Column(String, unique=True, index=True)
     description: Column[String] = Column(String)
 
@@ -21,16 +23,6 @@ class Menu(Base):
         cascade='all, delete',
     )
 
-    submenus_count: column_property = column_property(
-        select([func.count()])
-        .where(Submenu.menu_id == id)
-        .scalar_subquery()
-    )
-
-    dishes_count: column_property = column_property(
-        select([func.count()])
-        .where(
-            Dish.submenu_id.in_(select(Submenu.id).where(Submenu.menu_id == id))
-        )
-        .scalar_subquery()
-    )
+    # Счетчики поддерживают триггеры на submenus и dishes
+    submenus_count: Column[Integer] = Column(Integer, nullable=False, server_default='0')
+    dishes_count: Column[Integer] = Column(Integer, nullable=False, server_default='0')
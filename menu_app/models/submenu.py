@@ -1,22 +1,26 @@
-import uuid
-
 from menu_app.database import Base
-from menu_app.models.dish import Dish
-from sqlalchemy import Column, ForeignKey, String, func, select
+from menu_app.models.ids import ID_DEFAULT, ID_SERVER_DEFAULT
+from sqlalchemy import DDL, Column, ForeignKey, Integer, String, event
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import column_property, relationship
+from sqlalchemy.orm import relationship
 
 
 class Submenu(Base):
     __tablename__: str = 'submenus'
 
-    id: Column[UUID] = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Column[UUID] = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=ID_DEFAULT,
+        server_default=ID_SERVER_DEFAULT,
+    )
     title: Column[String] = Column(String, unique=True, index=True)
     description: Column[String] = Column(String)
 
     menu_id: Column[UUID] = Column(
         UUID(as_uuid=True),
         ForeignKey('menus.id', ondelete='CASCADE'),
+        index=True,
     )
     menu: relationship = relationship('Menu', back_populates='submenus')
 
@@ -26,8 +30,45 @@ class Submenu(Base):
         cascade='all, delete',
     )
 
-    dishes_count: column_property = column_property(
-        select([func.count()])
-        .where(Dish.submenu_id == id)
-        .scalar_subquery()
-    )
+    # Счетчик поддерживает триггер на dishes
+    dishes_count: Column[Integer] = Column(Integer, nullable=False, server_default='0')
+
+
+# Поддерживает menus.submenus_count и menus.dishes_count.
+# При каскадном удалении подменю его блюда уже не находят свое подменю,
+# поэтому блюда удаленного подменю вычитаются здесь через OLD.dishes_count
+SUBMENUS_COUNT_FUNCTION: DDL = DDL('''
+CREATE OR REPLACE FUNCTION update_menu_submenus_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.menu_id IS NOT DISTINCT FROM NEW.menu_id THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE menus
+        SET submenus_count = submenus_count + 1,
+            dishes_count = dishes_count + NEW.dishes_count
+        WHERE id = NEW.menu_id;
+    END IF;
+
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE menus
+        SET submenus_count = submenus_count - 1,
+            dishes_count = dishes_count - OLD.dishes_count
+        WHERE id = OLD.menu_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+''')
+
+SUBMENUS_COUNT_TRIGGER: DDL = DDL('''
+CREATE TRIGGER submenus_count
+AFTER INSERT OR DELETE OR UPDATE OF menu_id ON submenus
+FOR EACH ROW EXECUTE FUNCTION update_menu_submenus_count()
+''')
+
+# asyncpg выполняет по одной команде за запрос, поэтому функция и триггер разделены
+event.listen(Submenu.__table__, 'after_create', SUBMENUS_COUNT_FUNCTION)
+event.listen(Submenu.__table__, 'after_create', SUBMENUS_COUNT_TRIGGER)
@@ -1,41 +1,931 @@
+import asyncio
+import hashlib
 import json
 import os
-from typing import Any
+import random
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any, NamedTuple
 
 from pydantic import parse_obj_as
 from pydantic.json import pydantic_encoder
 from redis.asyncio import Redis
+from redis.exceptions import ConnectionError, ResponseError
 
 REDIS_HOST: str = str(os.getenv('REDIS_HOST'))
 redis: Redis = Redis(host=REDIS_HOST, port=6379, db=0, decode_responses=True)
 
+# Межпроцессная блокировка загрузки: только один воркер идет в БД за ключом,
+# остальные ждут, пока значение появится в Redis
+CACHE_LOCK_ENABLED: bool = os.getenv('CACHE_LOCK_ENABLED', '0') == '1'
+CACHE_LOCK_TIMEOUT: float = float(os.getenv('CACHE_LOCK_TIMEOUT', '2'))
+CACHE_LOCK_POLL_INTERVAL: float = 0.02
+
+# Локальный кэш процесса перед Redis. Согласованность между воркерами
+# поддерживается рассылкой инвалидаций через pub/sub, TTL ограничивает
+# время жизни записи, если сообщение потерялось
+CACHE_LOCAL_MAX_ENTRIES: int = int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', '1024'))
+CACHE_LOCAL_TTL: float = float(os.getenv('CACHE_LOCAL_TTL', '5'))
+INVALIDATION_CHANNEL: str = 'cache:invalidation'
+INVALIDATION_RECONNECT_DELAY: float = 1
+
+# Время жизни записей по сущностям, секунды. Разброс (jitter) не дает
+# записям, созданным одновременно, истечь одновременно
+CACHE_TTLS: dict[str, int] = {
+    'menus': int(os.getenv('CACHE_TTL_MENUS', '3600')),
+    'submenus': int(os.getenv('CACHE_TTL_SUBMENUS', '1800')),
+    'dishes': int(os.getenv('CACHE_TTL_DISHES', '900')),
+}
+CACHE_TTL_JITTER: float = float(os.getenv('CACHE_TTL_JITTER', '0.1'))
+# Ключ версии живет дольше любой записи, которая от него зависит
+CACHE_VERSION_TTL: int = 2 * max(CACHE_TTLS.values())
+
+# Stale-while-revalidate: последние CACHE_SWR_WINDOW секунд жизни записи
+# она считается устаревшей и отдается сразу, а фоновая загрузка ее обновляет.
+# После инвалидации отдается последняя известная копия (stale:<ключ>).
+# Режим жертвует чтением своих записей ради ровной задержки
+CACHE_SWR_ENABLED: bool = os.getenv('CACHE_SWR_ENABLED', '0') == '1'
+CACHE_SWR_WINDOW: int = int(os.getenv('CACHE_SWR_WINDOW', '60'))
+STALE_KEY_PREFIX: str = 'stale:2:'
+
+# Лимит памяти Redis и политика вытеснения. volatile-* вытесняет только
+# ключи с TTL, поэтому счетчик поколений никогда не вытесняется
+CACHE_MAX_MEMORY: str | None = os.getenv('CACHE_MAX_MEMORY')
+CACHE_EVICTION_POLICY: str = os.getenv('CACHE_EVICTION_POLICY', 'volatile-lru')
+CACHE_MEMORY_SCAN_BATCH: int = 1000
+
+RELEASE_LOCK_SCRIPT: str = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+release_lock = redis.register_script(RELEASE_LOCK_SCRIPT)
+
+# Ключи версионируются: в физический ключ входят версии самого ключа
+# и всех поддеревьев (меню, подменю), в которых он лежит.
+# Инвалидация поддерева - удаление одного ключа версии, без SCAN.
+# Отсутствующая версия получает новое значение глобального счетчика поколений,
+# поэтому старые физические ключи после инвалидации больше не читаются
+GENERATION_KEY: str = 'cache:generation'
+# Номер формата записи в префиксах версий и копий SWR: записи прежнего
+# формата (без ETag) больше не читаются и истекают по TTL
+VERSION_KEY_PREFIX: str = 'version:2:'
+
+# Запись кэша - сильный ETag (хеш тела) фиксированной длины и сразу за ним тело.
+# Тег посчитан при записи, поэтому ответу 304 не нужно ни хешировать,
+# ни сериализовать тело; из Redis запись при этом читается целиком.
+# Скрипт write-through пересчитывает тег, когда правит тело на месте
+ETAG_LENGTH: int = 42
+
+READ_SCRIPT: str = """
+local versions = {}
+for i = 2, #KEYS do
+    local version = redis.call('GET', KEYS[i])
+    if not version then
+        version = redis.call('INCR', KEYS[1])
+        redis.call('SET', KEYS[i], version, 'EX', ARGV[2])
+    end
+    versions[#versions + 1] = version
+end
+local cache_key = ARGV[1] .. '@' .. table.concat(versions, '.')
+local value = redis.call('GET', cache_key)
+local ttl_left = -1
+local stale_value = false
+if ARGV[3] == '1' then
+    if value then
+        ttl_left = redis.call('PTTL', cache_key)
+    else
+        stale_value = redis.call('GET', ARGV[4] .. ARGV[1])
+    end
+end
+return {cache_key, value, ttl_left, stale_value}
+"""
+read_versioned = redis.register_script(READ_SCRIPT)
+
+# Write-through: после create/update новое значение записывается в кэш сразу,
+# а родительские списки и счетчики правятся на месте одним атомарным скриптом.
+# Если правимой записи нет, ее версия сбрасывается: загрузка, начатая
+# до записи в БД, не сможет положить старое значение под текущую версию
+CACHE_WRITE_THROUGH: bool = os.getenv('CACHE_WRITE_THROUGH', '0') == '1'
+CACHE_FILL_BATCH: int = 500
+
+# Прогрев при старте выполняет один воркер деплоя: остальные видят заявку
+# и ждут метку готовности, а не сканируют каталог повторно. Метки живут
+# не дольше прогретых записей, поэтому следующий деплой прогревает кэш снова.
+# Неудачный прогрев снимает заявку, и ожидающие стартуют сразу
+CACHE_WARMUP_KEY: str = 'cache:warmup'
+CACHE_WARMUP_DONE_KEY: str = 'cache:warmup:done'
+CACHE_WARMUP_MARK_TTL: int = min(CACHE_TTLS.values())
+CACHE_WARMUP_POLL_INTERVAL: float = 0.1
+
+WRITE_THROUGH_SCRIPT: str = r"""
+local function resolve(op, create)
+    local versions = {}
+    for i, version_key in ipairs(op.versions) do
+        local version = redis.call('GET', version_key)
+        if not version then
+            if not create then
+                return false
+            end
+            version = redis.call('INCR', KEYS[1])
+            redis.call('SET', version_key, version, 'EX', ARGV[2])
+        end
+        versions[i] = version
+    end
+    return op.key .. '@' .. table.concat(versions, '.')
+end
+
+-- Тело правится как текст, без cjson: порядок ключей и экранирование
+-- остаются как у dump_body, и ETag совпадает с ETag обычной загрузки.
+-- Объекты в телах плоские, а "поле": без экранирования бывает только вне строк
+local function skip_string(body, index)
+    while true do
+        index = string.find(body, '["\\]', index + 1)
+        if string.sub(body, index, index) == '"' then
+            return index
+        end
+        index = index + 1
+    end
+end
+
+-- Границы объекта, в котором лежит позиция: ближайшие { и } вне строк
+local function object_bounds(body, position)
+    local first
+    local index = 1
+    while true do
+        index = string.find(body, '[{}"]', index)
+        local char = string.sub(body, index, index)
+        if char == '"' then
+            index = skip_string(body, index)
+        elseif char == '{' then
+            first = index
+        elseif index > position then
+            return first, index
+        end
+        index = index + 1
+    end
+end
+
+local function find_object(body, id)
+    local position = string.find(body, '"id":"' .. id .. '"', 1, true)
+    if not position then
+        return nil
+    end
+    return object_bounds(body, position)
+end
+
+local function add(body, first, last, field, delta)
+    local _, value_start = string.find(body, '"' .. field .. '":', first, true)
+    if not value_start or value_start > last then
+        return body
+    end
+    local _, value_end, value = string.find(body, '^(%-?%d+)', value_start + 1)
+    return string.sub(body, 1, value_start)
+        .. string.format('%d', tonumber(value) + delta)
+        .. string.sub(body, value_end + 1)
+end
+
+local function upsert(body, element)
+    local first, last = find_object(body, cjson.decode(element).id)
+    if first then
+        return string.sub(body, 1, first - 1) .. element .. string.sub(body, last + 1)
+    end
+    if body == '[]' then
+        return '[' .. element .. ']'
+    end
+    return string.sub(body, 1, -2) .. ',' .. element .. ']'
+end
+
+local function edit(body, op)
+    if op.op == 'upsert' then
+        return upsert(body, op.value)
+    end
+    if not op.id then
+        return add(body, 1, #body, op.field, op.delta)
+    end
+    local first, last = find_object(body, op.id)
+    if not first then
+        return body
+    end
+    return add(body, first, last, op.field, op.delta)
+end
+
+-- Тело записи начинается после ETag длиной 42
+local function unpack(value)
+    return string.sub(value, 43)
+end
+
+local function pack(body)
+    return '"' .. redis.sha1hex(body) .. '"' .. body
+end
+
+local ops = cjson.decode(ARGV[1])
+
+for _, op in ipairs(ops) do
+    if op.pages then
+        redis.call('DEL', op.pages)
+    end
+
+    if op.op ~= 'set' then
+        local cache_key = resolve(op, false)
+        local value = cache_key and redis.call('GET', cache_key)
+
+        if value then
+            redis.call('SET', cache_key, pack(edit(unpack(value), op)), 'KEEPTTL')
+        else
+            redis.call('DEL', op.versions[#op.versions])
+        end
+    end
+end
+
+for _, op in ipairs(ops) do
+    if op.op == 'set' then
+        if op.nx then
+            redis.call('SET', resolve(op, true), op.value, 'EX', op.ttl, 'NX')
+        else
+            redis.call('SET', resolve(op, true), op.value, 'EX', op.ttl)
+        end
+    end
+end
+
+if ARGV[3] ~= '' then
+    redis.call('PUBLISH', ARGV[3], ARGV[4])
+end
+return #ops
+"""
+write_through = redis.register_script(WRITE_THROUGH_SCRIPT)
+
+# Снимок экспорта: разделы по меню (тег и текст раздела, как запись кэша)
+# и тег всего снимка - хеш тегов разделов. Тело целиком не хранится:
+# ответ собирается потоком из разделов.
+# Мутаторы увеличивают версию каталога и удаляют раздел своего меню,
+# поэтому после записи пересобирается только этот раздел
+EXPORT_VERSION_KEY: str = 'export:version'
+EXPORT_SNAPSHOT_KEY: str = 'export:snapshot'
+EXPORT_SECTION_KEY_PREFIX: str = 'export:section:'
+# Записи в БД в обход сервиса версию не меняют: снимок и разделы
+# живут ограниченное время, поэтому такие изменения видны не позже чем через TTL.
+# У счетчика версии TTL нет: начатый заново счетчик совпал бы с версией старого снимка
+EXPORT_SNAPSHOT_TTL: int = int(os.getenv('EXPORT_SNAPSHOT_TTL', '300'))
+
+# Раздел и тег снимка сохраняются, только если версия каталога не изменилась
+# за время сборки: иначе раздел мог быть собран до записи в БД
+SAVE_EXPORT_SECTION_SCRIPT: str = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+save_export_section = redis.register_script(SAVE_EXPORT_SECTION_SCRIPT)
+
+SAVE_EXPORT_SNAPSHOT_SCRIPT: str = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[2], 'version', ARGV[1], 'etag', ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 1
+"""
+save_export_snapshot = redis.register_script(SAVE_EXPORT_SNAPSHOT_SCRIPT)
+
+
+def get_key_namespaces(key: str) -> list[str]:
+    # menus/1/submenus/2/dishes -> menus/1, menus/1/submenus/2, menus/1/submenus/2/dishes
+    # menus?limit=10 -> menus, menus?
+    path, page_separator, _ = key.partition('?')
+    segments = path.split('/')
+    namespaces = [
+        '/'.join(segments[:length])
+        for length in range(2, len(segments), 2)
+    ]
+    namespaces.append(path)
+
+    if page_separator:
+        namespaces.append(get_pages_namespace(path))
+
+    return namespaces
+
+
+def get_pages_namespace(list_key: str) -> str:
+    # Общая версия всех страниц списка: сбрасывается вместе со списком,
+    # а при write-through - отдельно, потому что страницы не правятся на месте
+    return f'{list_key}?'
+
+
+def get_version_key(namespace: str) -> str:
+    return f'{VERSION_KEY_PREFIX}{namespace}'
+
+
+def get_stale_key(key: str) -> str:
+    return f"{STALE_KEY_PREFIX}{key.split('@')[0]}"
+
+
+def get_key_entity(key: str) -> str:
+    # menus/1/submenus/2@3.4 -> submenus, menus?limit=10@3.4 -> menus
+    segments = key.split('@')[0].partition('?')[0].split('/')
+
+    if len(segments) % 2 == 0:
+        return segments[-2]
+
+    return segments[-1]
+
+
+def get_key_prefix(key: str) -> str:
+    if key.startswith(VERSION_KEY_PREFIX):
+        return 'version'
+
+    if key.startswith('lock:'):
+        return 'lock'
+
+    if key.startswith(STALE_KEY_PREFIX):
+        return 'stale'
+
+    if key.startswith('cache:'):
+        return 'cache'
+
+    if key.startswith('export:'):
+        return 'export'
+
+    return get_key_entity(key)
+
+
+def get_key_ttl(key: str) -> int:
+    ttl = CACHE_TTLS.get(get_key_entity(key), CACHE_TTLS['menus'])
+    jitter = random.uniform(-CACHE_TTL_JITTER, CACHE_TTL_JITTER)
+    ttl = max(1, round(ttl * (1 + jitter)))
+
+    if CACHE_SWR_ENABLED:
+        ttl += CACHE_SWR_WINDOW
+
+    return ttl
+
+
+def make_write_op(op: str, key: str, **params: Any) -> dict[str, Any]:
+    return {
+        'op': op,
+        'key': key,
+        'versions': [get_version_key(namespace) for namespace in get_key_namespaces(key)],
+        **params,
+    }
+
+
+def make_set_op(key: str, body: str, nx: bool = False) -> dict[str, Any]:
+    return make_write_op('set', key, value=pack_entry(body), ttl=get_key_ttl(key), nx=nx)
+
+
+def make_upsert_op(list_key: str, body: str) -> dict[str, Any]:
+    pages = get_version_key(get_pages_namespace(list_key))
+    return make_write_op('upsert', list_key, value=body, pages=pages)
+
+
+def make_incr_op(
+    key: str,
+    field: str,
+    delta: int,
+    item_id: Any = None,
+) -> dict[str, Any]:
+    # item_id задан - правится элемент списка с этим id, иначе сама запись
+    params: dict[str, Any] = {'field': field, 'delta': delta}
+
+    if item_id is not None:
+        params['id'] = str(item_id)
+        params['pages'] = get_version_key(get_pages_namespace(key))
+
+    return make_write_op('incr', key, **params)
+
+
+def dump_body(data: Any) -> str:
+    # Тот же формат, что отдает JSONResponse
+    return json.dumps(
+        data,
+        default=pydantic_encoder,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    )
+
+
+class CacheEntry(NamedTuple):
+    etag: str
+    body: str
+
+
+def make_etag(body: str) -> str:
+    return f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+
+def is_not_modified(etag: str, if_none_match: str | None) -> bool:
+    # If-None-Match сравнивается слабо: W/"тег" совпадает с "тег"
+    if if_none_match is None:
+        return False
+
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+
+    return '*' in tags or etag in tags
+
+
+def pack_entry(body: str) -> str:
+    return make_etag(body) + body
+
+
+def unpack_entry(value: str) -> CacheEntry:
+    return CacheEntry(value[:ETAG_LENGTH], value[ETAG_LENGTH:])
+
+
+class RedisCacheStats:
+    def __init__(self) -> None:
+        self.reads = 0
+        self.local_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.refreshes = 0
+        self.coalesced = 0
+        # Все обращения к Redis и только те, что выполнены ради чтений:
+        # записи, инвалидации и прогрев не портят оценку стоимости чтения
+        self.round_trips = 0
+        self.read_round_trips = 0
+
+    def count_read_round_trip(self) -> None:
+        self.round_trips += 1
+        self.read_round_trips += 1
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            'reads': self.reads,
+            'local_hits': self.local_hits,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'refreshes': self.refreshes,
+            'coalesced': self.coalesced,
+            'round_trips': self.round_trips,
+            'read_round_trips': self.read_round_trips,
+            'round_trips_per_read': (
+                self.read_round_trips / self.reads if self.reads else 0
+            ),
+        }
+
+
+stats: RedisCacheStats = RedisCacheStats()
+
+
+class LocalCache:
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        # Растет при каждой инвалидации. Значение, загруженное до инвалидации,
+        # в локальный кэш не попадает
+        self.epoch = 0
+
+    def get(self, key: str) -> Any:
+        entry = self.entries.get(key)
+
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+
+        return value
+
+    def set(self, key: str, value: Any, epoch: int) -> None:
+        if self.max_entries <= 0 or epoch != self.epoch:
+            return
+
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, keys: list[str]) -> None:
+        self.epoch += 1
+        invalidated_keys = set(keys)
+
+        for key in list(self.entries):
+            if invalidated_keys.intersection(get_key_namespaces(key)):
+                del self.entries[key]
+
+    def clear(self) -> None:
+        self.epoch += 1
+        self.entries.clear()
+
+
+local_cache: LocalCache = LocalCache(CACHE_LOCAL_MAX_ENTRIES, CACHE_LOCAL_TTL)
+
+# Загрузки, выполняющиеся в этом процессе, по ключу кэша
+inflight_loads: dict[str, asyncio.Task] = {}
+
+
+def start_load(key: str, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+    load_task = asyncio.ensure_future(loader())
+    inflight_loads[key] = load_task
+    load_task.add_done_callback(lambda _: inflight_loads.pop(key, None))
+
+    return load_task
+
+
+def log_refresh_error(refresh_task: asyncio.Task) -> None:
+    if not refresh_task.cancelled() and refresh_task.exception() is not None:
+        print(f'Cache refresh failed: {refresh_task.exception()!r}')
+
 
 class RedisCache:
     @staticmethod
-    async def read(key, schema_class, model_loader) -> Any:
-        if not await redis.exists(key):
+    async def read(
+        key,
+        schema_class,
+        model_loader,
+        refresh_loader=None,
+    ) -> CacheEntry | None:
+        # Возвращает готовое JSON-тело ответа и его ETag: в кэше хранятся именно они,
+        # поэтому при попадании нет ни json.loads, ни валидации pydantic.
+        # refresh_loader загружает данные вне запроса (своей сессией БД),
+        # им обновляются устаревшие записи в режиме SWR
+        stats.reads += 1
+        local_entry = local_cache.get(key)
+
+        if local_entry is not None:
+            stats.local_hits += 1
+            return local_entry
+
+        local_epoch = local_cache.epoch
+
+        stats.count_read_round_trip()
+        version_keys = [get_version_key(namespace) for namespace in get_key_namespaces(key)]
+        cache_key, cached_data, ttl_left, stale_data = await read_versioned(
+            keys=[GENERATION_KEY, *version_keys],
+            args=[key, CACHE_VERSION_TTL, int(CACHE_SWR_ENABLED), STALE_KEY_PREFIX],
+        )
+        is_stale = (
+            cached_data is not None and 0 <= ttl_left < CACHE_SWR_WINDOW * 1000
+        ) or (
+            cached_data is None and stale_data is not None
+        )
+
+        if is_stale and refresh_loader is not None:
+            print(f'Cache stale. Key: {key}')
+            stats.stale += 1
+
+            RedisCache.refresh(cache_key, schema_class, refresh_loader)
+
+            # Устаревшее значение не попадает в локальный кэш
+            return unpack_entry(cached_data if cached_data is not None else stale_data)
+
+        if cached_data is not None:
+            print(f'Cache hit. Key: {key}')
+            stats.hits += 1
+
+            result = cached_data
+        else:
             print(f'Cache miss. Key: {key}')
+            stats.misses += 1
+
+            result = await RedisCache.load_once(
+                cache_key,
+                lambda: RedisCache.load(cache_key, schema_class, model_loader),
+            )
 
-            load_result = await model_loader()
+        if result is None:
+            return None
 
-            if load_result is None:
-                return None
+        entry = unpack_entry(result)
+        local_cache.set(key, entry, local_epoch)
 
-            data_for_dump = parse_obj_as(schema_class, load_result)
+        return entry
 
-            await redis.set(key, json.dumps(data_for_dump, default=pydantic_encoder))
+    @staticmethod
+    async def load_once(
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        load_task = inflight_loads.get(key)
+
+        if load_task is None:
+            load_task = start_load(key, loader)
         else:
-            print(f'Cache hit. Key: {key}')
+            stats.coalesced += 1
+
+        # shield: отмена одного ожидающего запроса не отменяет общую загрузку
+        return await asyncio.shield(load_task)
+
+    @staticmethod
+    def refresh(key, schema_class, model_loader) -> None:
+        if key in inflight_loads:
+            return
+
+        stats.refreshes += 1
+        refresh_task = start_load(
+            key,
+            lambda: RedisCache.load(key, schema_class, model_loader, True),
+        )
+        refresh_task.add_done_callback(log_refresh_error)
+
+    @staticmethod
+    async def load(
+        key,
+        schema_class,
+        model_loader,
+        overwrite: bool = False,
+    ) -> str | None:
+        if not CACHE_LOCK_ENABLED:
+            return await RedisCache.load_and_set(
+                key, schema_class, model_loader, overwrite,
+            )
+
+        lock_key = f'lock:{key}'
+        lock_token = uuid.uuid4().hex
+
+        stats.count_read_round_trip()
+        if await redis.set(lock_key, lock_token, nx=True, px=int(CACHE_LOCK_TIMEOUT * 1000)):
+            try:
+                return await RedisCache.load_and_set(
+                    key, schema_class, model_loader, overwrite,
+                )
+            finally:
+                stats.count_read_round_trip()
+                await release_lock(keys=[lock_key], args=[lock_token])
+
+        cached_data = await RedisCache.wait_for_lock_holder(key, lock_key)
+        if cached_data is not None:
+            return cached_data
+
+        return await RedisCache.load_and_set(
+            key, schema_class, model_loader, overwrite,
+        )
+
+    @staticmethod
+    async def wait_for_lock_holder(key: str, lock_key: str) -> str | None:
+        # Ключ загружает другой воркер: ждем его результат не дольше таймаута.
+        # None - блокировка снята, а значения нет (например, объект не найден),
+        # или таймаут истек: тогда загружаем сами
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CACHE_LOCK_TIMEOUT
+
+        while loop.time() < deadline:
+            await asyncio.sleep(CACHE_LOCK_POLL_INTERVAL)
+
+            stats.count_read_round_trip()
+            cached_data, lock_holder = await redis.mget(key, lock_key)
+
+            if cached_data is not None:
+                stats.coalesced += 1
+                return cached_data
+
+            if lock_holder is None:
+                break
+
+        return None
+
+    @staticmethod
+    async def load_and_set(
+        key,
+        schema_class,
+        model_loader,
+        overwrite: bool = False,
+    ) -> str | None:
+        load_result = await model_loader()
+
+        if load_result is None:
+            if CACHE_SWR_ENABLED:
+                stats.count_read_round_trip()
+                await redis.delete(get_stale_key(key))
+
+            return None
+
+        entry = pack_entry(dump_body(parse_obj_as(schema_class, load_result)))
+        ttl = get_key_ttl(key)
+
+        stats.count_read_round_trip()
+        async with redis.pipeline(transaction=False) as pipe:
+            # NX: значение, записанное write-through во время загрузки, новее
+            # загруженного. Перезаписывает только обновление устаревшей записи
+            pipe.set(key, entry, ex=ttl, nx=not overwrite)
+
+            if CACHE_SWR_ENABLED:
+                pipe.set(get_stale_key(key), entry, ex=ttl)
 
-        loaded_data = json.loads(str(await redis.get(key)))
+            await pipe.execute()
 
-        return parse_obj_as(schema_class, loaded_data)
+        return entry
 
     @staticmethod
-    async def delete(key: str) -> None:
-        await redis.delete(key)
+    async def delete(*keys: str) -> None:
+        local_cache.invalidate(list(keys))
 
-        _, child_keys = await redis.scan(0, match=key + '/*')
+        # Ключи версий и рассылка другим воркерам - одной транзакцией
+        stats.round_trips += 1
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(*[get_version_key(key) for key in keys])
+            pipe.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+            await pipe.execute()
+
+    @staticmethod
+    async def write_through(ops: list[dict[str, Any]]) -> None:
+        keys = [op['key'] for op in ops]
+        local_cache.invalidate(keys)
+
+        stats.round_trips += 1
+        await write_through(
+            keys=[GENERATION_KEY],
+            args=[
+                json.dumps(ops, ensure_ascii=False),
+                CACHE_VERSION_TTL,
+                INVALIDATION_CHANNEL,
+                json.dumps(keys),
+            ],
+        )
+
+    @staticmethod
+    async def claim_warmup() -> bool:
+        return bool(
+            await redis.set(CACHE_WARMUP_KEY, '1', nx=True, ex=CACHE_WARMUP_MARK_TTL),
+        )
+
+    @staticmethod
+    async def finish_warmup() -> None:
+        await redis.set(CACHE_WARMUP_DONE_KEY, '1', ex=CACHE_WARMUP_MARK_TTL)
+
+    @staticmethod
+    async def release_warmup() -> None:
+        await redis.delete(CACHE_WARMUP_KEY)
+
+    @staticmethod
+    async def wait_for_warmup(timeout: float) -> bool:
+        # True - кэш прогрет другим воркером, False - заявка снята
+        # без метки готовности или прогрев не закончился за timeout
+        deadline = time.monotonic() + timeout
+
+        while time.monotonic() < deadline:
+            claim, done = await redis.mget(CACHE_WARMUP_KEY, CACHE_WARMUP_DONE_KEY)
+            if done is not None:
+                return True
+            if claim is None:
+                return False
+
+            await asyncio.sleep(CACHE_WARMUP_POLL_INTERVAL)
+
+        return False
+
+    @staticmethod
+    async def fill(entries: dict[str, str]) -> None:
+        # Прогрев: записывает готовые тела пачками, не перезаписывая
+        # значения, которые успели появиться раньше
+        ops = [make_set_op(key, body, True) for key, body in entries.items()]
+
+        for batch_start in range(0, len(ops), CACHE_FILL_BATCH):
+            stats.round_trips += 1
+            await write_through(
+                keys=[GENERATION_KEY],
+                args=[
+                    json.dumps(
+                        ops[batch_start:batch_start + CACHE_FILL_BATCH],
+                        ensure_ascii=False,
+                    ),
+                    CACHE_VERSION_TTL,
+                    '',
+                    '',
+                ],
+            )
+
+    @staticmethod
+    async def read_export_tag() -> tuple[str, str | None, str | None]:
+        # Версия каталога и тег снимка - без тела, его может не понадобиться читать
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.get(EXPORT_VERSION_KEY)
+            pipe.hmget(EXPORT_SNAPSHOT_KEY, 'version', 'etag')
+            version, (snapshot_version, snapshot_etag) = await pipe.execute()
+
+        return version or '0', snapshot_version, snapshot_etag
+
+    @staticmethod
+    async def read_export_section_tags(menu_ids: list[Any]) -> list[str | None]:
+        # Только теги разделов: GETRANGE не читает текст раздела
+        async with redis.pipeline(transaction=False) as pipe:
+            for menu_id in menu_ids:
+                pipe.getrange(f'{EXPORT_SECTION_KEY_PREFIX}{menu_id}', 0, ETAG_LENGTH - 1)
+            tags = await pipe.execute()
+
+        return [tag or None for tag in tags]
+
+    @staticmethod
+    async def read_export_sections(menu_ids: list[Any]) -> list[str | None]:
+        if not menu_ids:
+            return []
+
+        values = await redis.mget(
+            [f'{EXPORT_SECTION_KEY_PREFIX}{menu_id}' for menu_id in menu_ids],
+        )
+        return [
+            unpack_entry(value).body if value is not None else None
+            for value in values
+        ]
+
+    @staticmethod
+    async def save_export_section(version: str, menu_id: Any, entry: CacheEntry) -> bool:
+        saved = await save_export_section(
+            keys=[EXPORT_VERSION_KEY, f'{EXPORT_SECTION_KEY_PREFIX}{menu_id}'],
+            args=[version, entry.etag + entry.body, EXPORT_SNAPSHOT_TTL],
+        )
+        return saved == 1
+
+    @staticmethod
+    async def save_export_snapshot(version: str, etag: str) -> bool:
+        saved = await save_export_snapshot(
+            keys=[EXPORT_VERSION_KEY, EXPORT_SNAPSHOT_KEY],
+            args=[version, etag, EXPORT_SNAPSHOT_TTL],
+        )
+        return saved == 1
+
+    @staticmethod
+    async def invalidate_export(*menu_ids: Any) -> None:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.incr(EXPORT_VERSION_KEY)
+            pipe.delete(*[f'{EXPORT_SECTION_KEY_PREFIX}{menu_id}' for menu_id in menu_ids])
+            await pipe.execute()
+
+    @staticmethod
+    async def configure_memory_policy() -> None:
+        if CACHE_MAX_MEMORY is None:
+            return
+
+        try:
+            await redis.config_set('maxmemory', CACHE_MAX_MEMORY)
+            await redis.config_set('maxmemory-policy', CACHE_EVICTION_POLICY)
+        except ResponseError as error:
+            # Управляемые Redis часто запрещают CONFIG SET
+            print(f'Cannot configure Redis memory policy: {error}')
+
+    @staticmethod
+    async def get_memory_stats() -> dict[str, Any]:
+        memory_info = await redis.info('memory')
+
+        return {
+            'used_memory': memory_info.get('used_memory'),
+            'maxmemory': memory_info.get('maxmemory'),
+            'maxmemory_policy': memory_info.get('maxmemory_policy'),
+            'prefixes': await RedisCache.get_prefix_memory(),
+        }
+
+    @staticmethod
+    async def get_prefix_memory(match: str | None = None) -> dict[str, dict[str, int]]:
+        # Обходит все пространство ключей: только для диагностики и подбора
+        # размера инстанса, не для горячего пути.
+        # Каждая пачка SCAN измеряется сразу, в памяти - одна пачка ключей
+        prefixes: dict[str, dict[str, int]] = {}
+        cursor = None
+
+        while cursor != 0:
+            cursor, keys = await redis.scan(
+                cursor or 0,
+                match=match,
+                count=CACHE_MEMORY_SCAN_BATCH,
+            )
+            await RedisCache.add_memory_usage(prefixes, keys)
+
+        return prefixes
+
+    @staticmethod
+    async def add_memory_usage(
+        prefixes: dict[str, dict[str, int]],
+        keys: list[str],
+    ) -> None:
+        if not keys:
+            return
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.memory_usage(key)
+            usages = await pipe.execute()
+
+        for key, usage in zip(keys, usages):
+            prefix_stats = prefixes.setdefault(get_key_prefix(key), {'keys': 0, 'bytes': 0})
+            prefix_stats['keys'] += 1
+            prefix_stats['bytes'] += usage or 0
+
+    @staticmethod
+    async def listen_invalidations() -> None:
+        while True:
+            try:
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    # Пока подписки не было, сообщения могли потеряться
+                    local_cache.clear()
 
-        if len(child_keys) > 0:
-            await redis.delete(*child_keys)
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            local_cache.invalidate(json.loads(message['data']))
+            except ConnectionError:
+                print('Cache invalidation channel lost, reconnecting')
+                local_cache.clear()
+                await asyncio.sleep(INVALIDATION_RECONNECT_DELAY)
@@ -1,79 +1,505 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Callable
+from enum import Enum
+from tempfile import SpooledTemporaryFile
+from typing import Any
 from uuid import UUID
 
 from menu_app.models.dish import Dish
 from menu_app.models.menu import Menu
 from menu_app.models.submenu import Submenu
+from menu_app.redis_cache import (
+    CacheEntry,
+    RedisCache,
+    is_not_modified,
+    make_etag,
+)
+from menu_app.schemas.catalog import (
+    CatalogImport,
+    DishImport,
+    MenuImport,
+    SubmenuImport,
+)
+from pydantic.json import pydantic_encoder
 from sqlalchemy import select
 from sqlalchemy.engine.row import Row
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+# XLSX и Parquet нужны только для аналитических выгрузок,
+# поэтому их библиотеки необязательны: без них эти форматы отвечают 501
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Строки читаются серверным курсором пачками такого размера,
+# поэтому память не зависит от размера каталога.
+# Каждая пачка кодируется целиком, а не по ячейке
+EXPORT_BATCH_SIZE: int = 1000
+# XLSX собирается в zip только целиком: до этого размера - в памяти, дальше - на диске
+EXPORT_SPOOL_MAX_SIZE: int = 16 * 1024 * 1024
+EXPORT_CHUNK_SIZE: int = 64 * 1024
+# Снимок TSV читается из Redis и собирается из БД пачками разделов по меню
+EXPORT_SECTION_BATCH_SIZE: int = 10
+
+EXPORT_COLUMNS: list[str] = [
+    'menu_id', 'menu_title', 'menu_description',
+    'submenu_id', 'submenu_title', 'submenu_description',
+    'dish_id', 'dish_title', 'dish_description', 'dish_price',
+]
+
+
+class ExportFormat(str, Enum):
+    tsv = 'tsv'
+    csv = 'csv'
+    jsonl = 'jsonl'
+    xlsx = 'xlsx'
+    parquet = 'parquet'
+
+
+def format_cell(value: Any) -> str:
+    # NULL выгружается пустой ячейкой, а не строкой 'None'
+    return '' if value is None else str(value)
 
 
 def make_csv_text(lists_list: list[list]) -> str:
     rows: map[str] = map(
-        lambda row: '\t'.join(map(str, row)),
+        lambda row: '\t'.join(map(format_cell, row)),
         lists_list,
     )
     return '\n'.join(rows)
 
 
-async def restaurant_menu_export(db: AsyncSession) -> str:
-    result = await db.execute(
+async def iter_export_records(
+    db: AsyncSession,
+    menu_ids: list[UUID] | None = None,
+) -> AsyncIterator[list[Row]]:
+    # Плоские записи: одна строка на блюдо. Внешние соединения дают строку
+    # и пустым меню и подменю - с NULL вместо полей подменю и блюда,
+    # поэтому каталог читается одним проходом, без запросов на каждое меню
+    query = (
         select(
-            Menu.id, Menu.title, Menu.description,
-            Submenu.id, Submenu.title, Submenu.description,
-            Dish.id, Dish.title, Dish.description, Dish.price,
+            Menu.id.label('menu_id'),
+            Menu.title.label('menu_title'),
+            Menu.description.label('menu_description'),
+            Submenu.id.label('submenu_id'),
+            Submenu.title.label('submenu_title'),
+            Submenu.description.label('submenu_description'),
+            Dish.id.label('dish_id'),
+            Dish.title.label('dish_title'),
+            Dish.description.label('dish_description'),
+            Dish.price.label('dish_price'),
         )
         .select_from(Menu)
-        .join(Submenu)
-        .join(Dish)
-        .order_by(Menu.id, Submenu.id, Dish.id),
+        .outerjoin(Submenu)
+        .outerjoin(Dish)
+        .order_by(Menu.id, Submenu.id, Dish.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
     )
-    export_data: list[Row] = result.all()
 
-    export_rows: list[list] = []
-    current_menu_id: UUID | None = None
-    current_submenu_id: UUID | None = None
+    if menu_ids is not None:
+        query = query.where(Menu.id.in_(menu_ids))
 
-    for export_row in export_data:
-        menu_id, menu_title, menu_description, \
-            submenu_id, submenu_title, submenu_description, \
-            dish_id, dish_title, dish_description, dish_price = export_row
-
-        if menu_id != current_menu_id:
-            export_rows.append(
-                [
-                    menu_id,
-                    menu_title,
-                    menu_description,
-                    '',
-                    '',
-                    '',
-                ],
-            )
-            current_menu_id = menu_id
-
-        if submenu_id != current_submenu_id:
-            export_rows.append(
-                [
-                    '',
-                    submenu_id,
-                    submenu_title,
-                    submenu_description,
-                    '',
-                    '',
-                ],
-            )
-            current_submenu_id = submenu_id
+    result = await db.stream(query)
+
+    async for export_data in result.partitions():
+        yield export_data
+
+
+def append_export_rows(
+    export_rows: list[list],
+    export_row: Row,
+    current_menu_id: UUID | None,
+    current_submenu_id: UUID | None,
+) -> tuple[UUID | None, UUID | None]:
+    # Строки меню и подменю добавляются при первой встрече,
+    # возвращаются id меню и подменю, на которых остановилась раскладка
+    menu_id, menu_title, menu_description, \
+        submenu_id, submenu_title, submenu_description, \
+        dish_id, dish_title, dish_description, dish_price = export_row
 
+    if menu_id != current_menu_id:
         export_rows.append(
             [
+                menu_id,
+                menu_title,
+                menu_description,
+                '',
                 '',
                 '',
-                dish_id,
-                dish_title,
-                dish_description,
-                dish_price,
             ],
         )
 
-    return make_csv_text(export_rows)
+    if submenu_id is None:
+        return menu_id, current_submenu_id
+
+    if submenu_id != current_submenu_id:
+        export_rows.append(
+            [
+                '',
+                submenu_id,
+                submenu_title,
+                submenu_description,
+                '',
+                '',
+            ],
+        )
+
+    if dish_id is None:
+        return menu_id, submenu_id
+
+    export_rows.append(
+        [
+            '',
+            '',
+            dish_id,
+            dish_title,
+            dish_description,
+            dish_price,
+        ],
+    )
+
+    return menu_id, submenu_id
+
+
+async def iter_export_rows(
+    db: AsyncSession,
+    menu_ids: list[UUID] | None = None,
+) -> AsyncIterator[list[list]]:
+    # Иерархическая раскладка: строка меню, строка подменю, строки блюд
+    current_menu_id: UUID | None = None
+    current_submenu_id: UUID | None = None
+
+    async for export_data in iter_export_records(db, menu_ids):
+        export_rows: list[list] = []
+
+        for export_row in export_data:
+            current_menu_id, current_submenu_id = append_export_rows(
+                export_rows,
+                export_row,
+                current_menu_id,
+                current_submenu_id,
+            )
+
+        yield export_rows
+
+
+async def restaurant_menu_export(db: AsyncSession) -> AsyncIterator[str]:
+    # Каждая пачка отдается клиенту сразу, без сборки всего файла
+    separator = ''
+
+    async for export_rows in iter_export_rows(db):
+        yield separator + make_csv_text(export_rows)
+        separator = '\n'
+
+
+async def iter_export_sections(
+    db: AsyncSession,
+    menu_ids: list[UUID],
+) -> AsyncIterator[tuple[UUID, str]]:
+    # Раздел меню - его строки в раскладке TSV. Строки идут по порядку меню,
+    # поэтому в памяти только раздел, который сейчас собирается
+    if not menu_ids:
+        return
+
+    section_rows: list[list] = []
+
+    async for export_rows in iter_export_rows(db, menu_ids):
+        for export_row in export_rows:
+            if export_row[0] != '' and section_rows:
+                yield section_rows[0][0], make_csv_text(section_rows)
+                section_rows = []
+
+            section_rows.append(export_row)
+
+    if section_rows:
+        yield section_rows[0][0], make_csv_text(section_rows)
+
+
+def append_catalog_row(menus: list[MenuImport], cells: list[str]) -> None:
+    # По первому непустому столбцу строка - меню, подменю или блюдо.
+    # Пустое описание - NULL: экспорт выгружает NULL пустой ячейкой
+    if cells[0]:
+        menus.append(
+            MenuImport(id=cells[0], title=cells[1], description=cells[2] or None),
+        )
+    elif cells[1]:
+        menus[-1].submenus.append(
+            SubmenuImport(id=cells[1], title=cells[2], description=cells[3] or None),
+        )
+    else:
+        menus[-1].submenus[-1].dishes.append(
+            DishImport(
+                id=cells[2],
+                title=cells[3],
+                description=cells[4] or None,
+                price=cells[5],
+            ),
+        )
+
+
+def parse_catalog_tsv(text: str) -> CatalogImport:
+    # Обратное преобразование раскладки экспорта
+    menus: list[MenuImport] = []
+
+    for line_number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+
+        cells = (line.split('\t') + [''] * 6)[:6]
+
+        try:
+            append_catalog_row(menus, cells)
+        except (IndexError, ValueError) as error:
+            raise ValueError(f'line {line_number}: {error}') from error
+
+    return CatalogImport(menus=menus)
+
+
+async def read_export_tags(
+    db: AsyncSession,
+    version: str,
+    menu_ids: list[UUID],
+) -> list[str]:
+    # Теги разделов из кэша; недостающие разделы собираются из БД
+    # и сохраняются по одному
+    section_tags = await RedisCache.read_export_section_tags(menu_ids)
+    missing_menu_ids = [
+        menu_id
+        for menu_id, section_tag in zip(menu_ids, section_tags)
+        if section_tag is None
+    ]
+    built_tags: dict[UUID, str] = {}
+
+    async for menu_id, section in iter_export_sections(db, missing_menu_ids):
+        entry = CacheEntry(make_etag(section), section)
+        await RedisCache.save_export_section(version, menu_id, entry)
+        built_tags[menu_id] = entry.etag
+
+    return [
+        section_tag or built_tags.get(menu_id, '')
+        for menu_id, section_tag in zip(menu_ids, section_tags)
+    ]
+
+
+async def make_export_etag(
+    db: AsyncSession,
+    version: str,
+    menu_ids: list[UUID],
+) -> str:
+    # Тег снимка - хеш тегов разделов, тела разделов для него не читаются
+    section_tags: list[str] = []
+
+    for batch_start in range(0, len(menu_ids), EXPORT_SECTION_BATCH_SIZE):
+        section_tags += await read_export_tags(
+            db,
+            version,
+            menu_ids[batch_start:batch_start + EXPORT_SECTION_BATCH_SIZE],
+        )
+
+    etag = make_etag(''.join(section_tags))
+    await RedisCache.save_export_snapshot(version, etag)
+
+    return etag
+
+
+async def read_export_batch(db: AsyncSession, menu_ids: list[UUID]) -> list[str]:
+    # Раздел, вытесненный после подсчета тега, собирается из БД заново
+    sections = await RedisCache.read_export_sections(menu_ids)
+    missing_menu_ids = [
+        menu_id
+        for menu_id, section in zip(menu_ids, sections)
+        if section is None
+    ]
+    built_sections = {
+        menu_id: section
+        async for menu_id, section in iter_export_sections(db, missing_menu_ids)
+    }
+
+    return [
+        section if section is not None else built_sections.get(menu_id, '')
+        for menu_id, section in zip(menu_ids, sections)
+    ]
+
+
+async def iter_export_snapshot(
+    db: AsyncSession,
+    menu_ids: list[UUID],
+) -> AsyncIterator[str]:
+    # Тело отдается по пачкам разделов и целиком в памяти не собирается
+    separator = ''
+
+    for batch_start in range(0, len(menu_ids), EXPORT_SECTION_BATCH_SIZE):
+        batch_menu_ids = menu_ids[batch_start:batch_start + EXPORT_SECTION_BATCH_SIZE]
+
+        for section in await read_export_batch(db, batch_menu_ids):
+            if section:
+                yield separator + section
+                separator = '\n'
+
+
+async def read_export_snapshot(
+    db: AsyncSession,
+    if_none_match: str | None = None,
+) -> tuple[str, AsyncIterator[str] | None]:
+    # Возвращает тег снимка и тело потоком; тело - None, если у клиента актуальный тег
+    version, snapshot_version, snapshot_etag = await RedisCache.read_export_tag()
+
+    if snapshot_version == version and is_not_modified(snapshot_etag, if_none_match):
+        return snapshot_etag, None
+
+    # Список меню - индексный запрос; из БД читаются только разделы,
+    # которых нет в кэше
+    result = await db.execute(select(Menu.id).order_by(Menu.id))
+    menu_ids: list[UUID] = result.scalars().all()
+
+    if snapshot_version != version:
+        snapshot_etag = await make_export_etag(db, version, menu_ids)
+
+        if is_not_modified(snapshot_etag, if_none_match):
+            return snapshot_etag, None
+
+    return snapshot_etag, iter_export_snapshot(db, menu_ids)
+
+
+async def export_csv(db: AsyncSession) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    async for export_rows in iter_export_rows(db):
+        writer.writerows(export_rows)
+        yield buffer.getvalue()
+
+        buffer.seek(0)
+        buffer.truncate()
+
+
+async def export_jsonl(db: AsyncSession) -> AsyncIterator[str]:
+    async for export_data in iter_export_records(db):
+        yield ''.join(
+            json.dumps(
+                dict(export_row._mapping),
+                default=pydantic_encoder,
+                ensure_ascii=False,
+            ) + '\n'
+            for export_row in export_data
+        )
+
+
+async def iter_file_chunks(file: SpooledTemporaryFile) -> AsyncIterator[bytes]:
+    file.seek(0)
+
+    with file:
+        while chunk := file.read(EXPORT_CHUNK_SIZE):
+            yield chunk
+
+
+async def export_xlsx(db: AsyncSession) -> AsyncIterator[bytes]:
+    # write_only: строки уходят во временный файл листа, а не в память
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Menu')
+
+    async for export_rows in iter_export_rows(db):
+        for export_row in export_rows:
+            sheet.append([
+                str(value) if isinstance(value, UUID) else value
+                for value in export_row
+            ])
+
+    file = SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    await run_in_threadpool(workbook.save, file)
+
+    async for chunk in iter_file_chunks(file):
+        yield chunk
+
+
+class ExportSink(io.RawIOBase):
+    # Приемник для ParquetWriter: накопленные байты забираются после каждой группы строк
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def get_parquet_schema() -> 'pyarrow.Schema':
+    return pyarrow.schema([
+        (column, pyarrow.decimal128(10, 2) if column == 'dish_price' else pyarrow.string())
+        for column in EXPORT_COLUMNS
+    ])
+
+
+def make_parquet_table(export_data: list[Row], schema: 'pyarrow.Schema') -> 'pyarrow.Table':
+    # Таблица собирается по столбцам; id хранятся строками
+    columns = {column: list(values) for column, values in zip(EXPORT_COLUMNS, zip(*export_data))}
+
+    for column in ('menu_id', 'submenu_id', 'dish_id'):
+        columns[column] = [
+            str(value) if value is not None else None
+            for value in columns[column]
+        ]
+
+    return pyarrow.table(columns, schema=schema)
+
+
+async def export_parquet(db: AsyncSession) -> AsyncIterator[bytes]:
+    # Одна пачка строк - одна группа строк Parquet
+    schema = get_parquet_schema()
+    sink = ExportSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+
+    async for export_data in iter_export_records(db):
+        writer.write_table(make_parquet_table(export_data, schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+EXPORT_WRITERS: dict[ExportFormat, Callable[[AsyncSession], AsyncIterator]] = {
+    ExportFormat.tsv: restaurant_menu_export,
+    ExportFormat.csv: export_csv,
+    ExportFormat.jsonl: export_jsonl,
+    ExportFormat.xlsx: export_xlsx,
+    ExportFormat.parquet: export_parquet,
+}
+
+EXPORT_MEDIA_TYPES: dict[ExportFormat, str] = {
+    ExportFormat.tsv: 'text/plain',
+    ExportFormat.csv: 'text/csv',
+    ExportFormat.jsonl: 'application/x-ndjson',
+    ExportFormat.xlsx: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    ExportFormat.parquet: 'application/vnd.apache.parquet',
+}
+
+EXPORT_DEPENDENCIES: dict[ExportFormat, bool] = {
+    ExportFormat.xlsx: Workbook is not None,
+    ExportFormat.parquet: pyarrow is not None,
+}
+
+
+def is_export_format_available(export_format: ExportFormat) -> bool:
+    return EXPORT_DEPENDENCIES.get(export_format, True)
@@ -3,8 +3,25 @@ from uuid import UUID
 from menu_app.models.dish import Dish
 from menu_app.models.menu import Menu
 from menu_app.models.submenu import Submenu
-from sqlalchemy import select
+from sqlalchemy import (
+    Column,
+    Numeric,
+    String,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
+from sqlalchemy.engine.row import Row
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
 
 # Этот файл работает только с моделями
 # Не импортируй схемы сюда
@@ -14,6 +31,31 @@ from sqlalchemy.ext.asyncio import AsyncSession
 #  - https://stackoverflow.com/a/2330912
 #  - https://martinfowler.com/bliki/DDD_Aggregate.html
 
+# Изменения - по одному запросу: INSERT/UPDATE ... RETURNING вместо
+# commit и refresh, DELETE ... RETURNING id вместо загрузки объекта.
+# Подменю и блюда удаляет ON DELETE CASCADE в самой БД,
+# счетчики поддерживают триггеры
+
+
+IMPORT_BATCH_SIZE: int = 1000
+
+
+def paginate(
+    query: Select,
+    key_column: Column,
+    limit: int | None,
+    after: UUID | None,
+) -> Select:
+    # Keyset-пагинация: следующая страница начинается после последнего id,
+    # поэтому ее стоимость не зависит от номера страницы
+    if limit is None:
+        return query
+
+    if after is not None:
+        query = query.where(key_column > after)
+
+    return query.order_by(key_column).limit(limit)
+
 
 class RestaurantRepository:
     def __init__(self, db: AsyncSession) -> None:
@@ -21,107 +63,330 @@ class RestaurantRepository:
 
     # Menu
 
-    async def read_menus(self) -> list[Menu]:
-        result = await self.db.execute(select(Menu))
+    async def read_menus(
+        self,
+        limit: int | None = None,
+        after: UUID | None = None,
+    ) -> list[Menu]:
+        result = await self.db.execute(paginate(select(Menu), Menu.id, limit, after))
         return result.scalars().all()
 
     async def read_menu(self, menu_id: UUID) -> Menu:
         result = await self.db.execute(select(Menu).where(Menu.id == menu_id))
         return result.scalars().first()
 
-    async def save_menu(self, menu: Menu, is_new: bool) -> Menu:
-        if is_new:
-            self.db.add(menu)
-
+    async def create_menu(self, values: dict) -> Row:
+        result = await self.db.execute(
+            insert(Menu).values(**values).returning(*Menu.__table__.c),
+        )
+        row = result.one()
         await self.db.commit()
-        await self.db.refresh(menu)
 
-        return menu
+        return row
 
-    async def delete_menu(self, menu_id: UUID) -> bool:
-        menu = await self.read_menu(menu_id)
+    async def update_menu(self, menu_id: UUID, values: dict) -> Row | None:
+        result = await self.db.execute(
+            update(Menu)
+            .where(Menu.id == menu_id)
+            .values(**values)
+            .returning(*Menu.__table__.c)
+            .execution_options(synchronize_session=False),
+        )
+        row = result.first()
+        await self.db.commit()
 
-        if not menu:
-            return False
+        return row
 
-        await self.db.delete(menu)
+    async def delete_menu(self, menu_id: UUID) -> bool:
+        result = await self.db.execute(
+            delete(Menu)
+            .where(Menu.id == menu_id)
+            .returning(Menu.id)
+            .execution_options(synchronize_session=False),
+        )
+        deleted_id = result.scalar()
         await self.db.commit()
 
-        return True
+        return deleted_id is not None
 
     # Submenu
 
-    async def read_submenus(self, menu_id: UUID) -> list[Submenu]:
-        result = await self.db.execute(select(Submenu).where(Menu.id == menu_id))
+    async def read_all_submenus(self) -> list[Submenu]:
+        result = await self.db.execute(select(Submenu))
+        return result.scalars().all()
+
+    async def read_submenus(
+        self,
+        menu_id: UUID,
+        limit: int | None = None,
+        after: UUID | None = None,
+    ) -> list[Submenu]:
+        result = await self.db.execute(
+            paginate(
+                select(Submenu).where(Submenu.menu_id == menu_id),
+                Submenu.id,
+                limit,
+                after,
+            ),
+        )
         return result.scalars().all()
 
     async def read_submenu(self, menu_id: UUID, submenu_id: UUID) -> Submenu:
         result = await self.db.execute(
             select(Submenu).
-            where(Menu.id == menu_id, Submenu.id == submenu_id),
+            where(Submenu.menu_id == menu_id, Submenu.id == submenu_id),
         )
         return result.scalars().first()
 
-    async def save_submenu(self, submenu: Submenu, is_new: bool) -> Submenu:
-        if is_new:
-            self.db.add(submenu)
+    async def create_submenu(self, values: dict) -> Row:
+        result = await self.db.execute(
+            insert(Submenu).values(**values).returning(*Submenu.__table__.c),
+        )
+        row = result.one()
+        await self.db.commit()
+
+        return row
 
+    async def update_submenu(
+        self,
+        menu_id: UUID,
+        submenu_id: UUID,
+        values: dict,
+    ) -> Row | None:
+        result = await self.db.execute(
+            update(Submenu)
+            .where(Submenu.menu_id == menu_id, Submenu.id == submenu_id)
+            .values(**values)
+            .returning(*Submenu.__table__.c)
+            .execution_options(synchronize_session=False),
+        )
+        row = result.first()
         await self.db.commit()
-        await self.db.refresh(submenu)
 
-        return submenu
+        return row
 
     async def delete_submenu(
         self,
         menu_id: UUID,
         submenu_id: UUID,
     ) -> bool:
-        submenu = await self.read_submenu(menu_id, submenu_id)
-
-        if not submenu:
-            return False
-
-        await self.db.delete(submenu)
+        result = await self.db.execute(
+            delete(Submenu)
+            .where(Submenu.menu_id == menu_id, Submenu.id == submenu_id)
+            .returning(Submenu.id)
+            .execution_options(synchronize_session=False),
+        )
+        deleted_id = result.scalar()
         await self.db.commit()
 
-        return True
+        return deleted_id is not None
 
     # Dish
 
-    async def read_dishes(self, submenu_id: UUID) -> list[Dish]:
+    async def read_all_dishes(self) -> list[Dish]:
+        result = await self.db.execute(select(Dish))
+        return result.scalars().all()
+
+    async def read_dishes(
+        self,
+        submenu_id: UUID,
+        limit: int | None = None,
+        after: UUID | None = None,
+    ) -> list[Dish]:
         result = await self.db.execute(
-            select(Dish).
-            where(Submenu.id == submenu_id),
+            paginate(
+                select(Dish).where(Dish.submenu_id == submenu_id),
+                Dish.id,
+                limit,
+                after,
+            ),
         )
         return result.scalars().all()
 
     async def read_dish(self, submenu_id: UUID, dish_id: UUID) -> Dish:
         result = await self.db.execute(
             select(Dish).
-            where(Submenu.id == submenu_id, Dish.id == dish_id),
+            where(Dish.submenu_id == submenu_id, Dish.id == dish_id),
         )
         return result.scalars().first()
 
-    async def save_dish(self, dish: Dish, is_new: bool) -> Dish:
-        if is_new:
-            self.db.add(dish)
+    async def create_dish(self, values: dict) -> Row:
+        result = await self.db.execute(
+            insert(Dish).values(**values).returning(*Dish.__table__.c),
+        )
+        row = result.one()
+        await self.db.commit()
+
+        return row
 
+    async def update_dish(
+        self,
+        submenu_id: UUID,
+        dish_id: UUID,
+        values: dict,
+    ) -> Row | None:
+        result = await self.db.execute(
+            update(Dish)
+            .where(Dish.submenu_id == submenu_id, Dish.id == dish_id)
+            .values(**values)
+            .returning(*Dish.__table__.c)
+            .execution_options(synchronize_session=False),
+        )
+        row = result.first()
         await self.db.commit()
-        await self.db.refresh(dish)
 
-        return dish
+        return row
 
     async def delete_dish(
         self,
         submenu_id: UUID,
         dish_id: UUID,
     ) -> bool:
-        dish = await self.read_dish(submenu_id, dish_id)
+        result = await self.db.execute(
+            delete(Dish)
+            .where(Dish.submenu_id == submenu_id, Dish.id == dish_id)
+            .returning(Dish.id)
+            .execution_options(synchronize_session=False),
+        )
+        deleted_id = result.scalar()
+        await self.db.commit()
+
+        return deleted_id is not None
 
-        if not dish:
+    async def apply_dish_batch(
+        self,
+        submenu_id: UUID,
+        creates: list[dict],
+        updates: list[dict],
+        deletes: list[UUID],
+    ) -> tuple[list[Dish], list[Dish], list[UUID]] | None:
+        # Все изменения - одной транзакцией и одним запросом на каждый вид.
+        # Сначала удаление, потом изменение и вставка: название удаленного
+        # блюда можно занять в том же пакете
+        dish_columns = Dish.__table__.c
+
+        try:
+            deleted = []
+            if deletes:
+                result = await self.db.execute(
+                    delete(Dish)
+                    .where(Dish.id.in_(deletes), Dish.submenu_id == submenu_id)
+                    .returning(Dish.id)
+                    .execution_options(synchronize_session=False),
+                )
+                deleted = result.scalars().all()
+
+            updated = []
+            if updates:
+                # UPDATE ... FROM (VALUES ...): None в поле - оставить как есть.
+                # Столбец из одних NULL Postgres считает text, поэтому типы приводятся явно
+                changes = values(
+                    column('id', PostgresUUID(as_uuid=True)),
+                    column('title', String),
+                    column('description', String),
+                    column('price', Numeric(10, 2)),
+                    name='changes',
+                ).data(
+                    [
+                        (change['id'], change['title'], change['description'], change['price'])
+                        for change in updates
+                    ],
+                )
+                result = await self.db.execute(
+                    update(Dish)
+                    .where(
+                        Dish.id == cast(changes.c.id, PostgresUUID(as_uuid=True)),
+                        Dish.submenu_id == submenu_id,
+                    )
+                    .values(
+                        title=func.coalesce(changes.c.title, Dish.title),
+                        description=func.coalesce(changes.c.description, Dish.description),
+                        price=func.coalesce(cast(changes.c.price, Numeric(10, 2)), Dish.price),
+                    )
+                    .returning(*dish_columns)
+                    .execution_options(synchronize_session=False),
+                )
+                updated = result.all()
+
+            created = []
+            if creates:
+                result = await self.db.execute(
+                    insert(Dish).values(creates).returning(*dish_columns),
+                )
+                created = result.all()
+
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            return None
+
+        return created, updated, deleted
+
+    # Import
+
+    async def import_catalog(
+        self,
+        menus: list[dict],
+        submenus: list[dict],
+        dishes: list[dict],
+    ) -> bool:
+        # Одна транзакция на весь каталог: строки вставляются пачками
+        # через executemany, id сгенерированы заранее, поэтому RETURNING не нужен
+        try:
+            for model, rows in ((Menu, menus), (Submenu, submenus), (Dish, dishes)):
+                for batch_start in range(0, len(rows), IMPORT_BATCH_SIZE):
+                    await self.db.execute(
+                        insert(model),
+                        rows[batch_start:batch_start + IMPORT_BATCH_SIZE],
+                    )
+
+            await self.db.commit()
+        except IntegrityError:
+            # Занятый id или название: каталог не импортируется частично
+            await self.db.rollback()
             return False
 
-        await self.db.delete(dish)
+        return True
+
+    # Counters
+
+    async def recount_counters(self) -> int:
+        # Пересчитывает счетчики с нуля, если они разошлись с данными.
+        # Подменю пересчитываются первыми, потому что меню суммирует их счетчики
+        dishes_count = (
+            select(func.count())
+            .where(Dish.submenu_id == Submenu.id)
+            .scalar_subquery()
+        )
+        submenus_result = await self.db.execute(
+            update(Submenu)
+            .where(Submenu.dishes_count != dishes_count)
+            .values(dishes_count=dishes_count)
+            .execution_options(synchronize_session=False),
+        )
+
+        submenus_count = (
+            select(func.count())
+            .where(Submenu.menu_id == Menu.id)
+            .scalar_subquery()
+        )
+        menu_dishes_count = (
+            select(func.coalesce(func.sum(Submenu.dishes_count), 0))
+            .where(Submenu.menu_id == Menu.id)
+            .scalar_subquery()
+        )
+        menus_result = await self.db.execute(
+            update(Menu)
+            .where(
+                or_(
+                    Menu.submenus_count != submenus_count,
+                    Menu.dishes_count != menu_dishes_count,
+                ),
+            )
+            .values(submenus_count=submenus_count, dishes_count=menu_dishes_count)
+            .execution_options(synchronize_session=False),
+        )
+
         await self.db.commit()
 
-        return True
+        return submenus_result.rowcount + menus_result.rowcount
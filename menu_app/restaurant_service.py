@@ -1,19 +1,38 @@
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from typing import Any
 from uuid import UUID
 
-from fastapi import BackgroundTasks, HTTPException, status
-from menu_app.models.dish import Dish
-from menu_app.models.menu import Menu
-from menu_app.models.submenu import Submenu
-from menu_app.redis_cache import RedisCache
+from fastapi import HTTPException, status
+from menu_app.database import async_session, reading_from_primary
+from menu_app.models.ids import uuid7
+from menu_app.redis_cache import (
+    CACHE_WRITE_THROUGH,
+    CacheEntry,
+    RedisCache,
+    dump_body,
+    make_incr_op,
+    make_set_op,
+    make_upsert_op,
+)
 from menu_app.restaurant_repo import RestaurantRepository
+from menu_app.schemas.catalog import CatalogImport, CatalogImportResult
 from menu_app.schemas.dish import Dish as DishSchema
-from menu_app.schemas.dish import DishCreate, DishUpdate
+from menu_app.schemas.dish import (
+    DishBatch,
+    DishBatchResult,
+    DishCreate,
+    DishUpdate,
+)
 from menu_app.schemas.menu import Menu as MenuSchema
 from menu_app.schemas.menu import MenuCreate, MenuUpdate
 from menu_app.schemas.submenu import Submenu as SubmenuSchema
 from menu_app.schemas.submenu import SubmenuCreate, SubmenuUpdate
 from pydantic import parse_obj_as
 
+PAGE_LIMIT_DEFAULT: int = 100
+PAGE_LIMIT_MAX: int = 1000
+
 
 def make_not_found_error(model_name: str) -> HTTPException:
     return HTTPException(
@@ -22,28 +41,157 @@ def make_not_found_error(model_name: str) -> HTTPException:
     )
 
 
+def make_conflict_error(model_name: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f'{model_name} conflicts with existing data',
+    )
+
+
+async def load_detached(
+    load: Callable[[RestaurantRepository], Awaitable[Any]],
+) -> Any:
+    # Загрузка вне запроса: сессия запроса к этому моменту может быть закрыта.
+    # Задача наследует контекст запроса, поэтому и маршрут чтения - его
+    async with async_session() as db:
+        return await load(RestaurantRepository(db))
+
+
 class RestaurantService:
-    def __init__(self, repo: RestaurantRepository, bg_tasks: BackgroundTasks) -> None:
+    def __init__(self, repo: RestaurantRepository) -> None:
         self.repo = repo
-        self.bg_tasks = bg_tasks
+
+    async def read_cached(
+        self,
+        key: str,
+        schema_class: Any,
+        load: Callable[[RestaurantRepository], Awaitable[Any]],
+    ) -> CacheEntry | None:
+        return await RedisCache.read(
+            key,
+            schema_class,
+            lambda: load(self.repo),
+            lambda: load_detached(load),
+        )
+
+    async def warm_up_cache(self) -> int:
+        # Три запроса на весь каталог вместо запроса на каждый ключ
+        menus = parse_obj_as(list[MenuSchema], await self.repo.read_menus())
+        submenus = parse_obj_as(
+            list[SubmenuSchema],
+            await self.repo.read_all_submenus(),
+        )
+        dishes = parse_obj_as(list[DishSchema], await self.repo.read_all_dishes())
+
+        submenus_by_menu: defaultdict[UUID, list[SubmenuSchema]] = defaultdict(list)
+        for submenu in submenus:
+            submenus_by_menu[submenu.menu_id].append(submenu)
+
+        dishes_by_submenu: defaultdict[UUID, list[DishSchema]] = defaultdict(list)
+        for dish in dishes:
+            dishes_by_submenu[dish.submenu_id].append(dish)
+
+        entries = {get_menu_list_key(): dump_body(menus)}
+
+        for menu in menus:
+            entries[get_menu_item_key(menu.id)] = dump_body(menu)
+            entries[get_submenu_list_key(menu.id)] = dump_body(
+                submenus_by_menu[menu.id],
+            )
+
+            for submenu in submenus_by_menu[menu.id]:
+                entries[get_submenu_item_key(menu.id, submenu.id)] = dump_body(submenu)
+                entries[get_dish_list_key(menu.id, submenu.id)] = dump_body(
+                    dishes_by_submenu[submenu.id],
+                )
+
+                for dish in dishes_by_submenu[submenu.id]:
+                    dish_key = get_dish_item_key(menu.id, submenu.id, dish.id)
+                    entries[dish_key] = dump_body(dish)
+
+        await RedisCache.fill(entries)
+
+        return len(entries)
+
+    async def import_catalog(self, catalog: CatalogImport) -> CatalogImportResult:
+        menus: list[dict] = []
+        submenus: list[dict] = []
+        dishes: list[dict] = []
+
+        for menu in catalog.menus:
+            menu_id = menu.id or uuid7()
+            menus.append(
+                {'id': menu_id, 'title': menu.title, 'description': menu.description},
+            )
+
+            for submenu in menu.submenus:
+                submenu_id = submenu.id or uuid7()
+                submenus.append(
+                    {
+                        'id': submenu_id,
+                        'menu_id': menu_id,
+                        'title': submenu.title,
+                        'description': submenu.description,
+                    },
+                )
+
+                dishes.extend(
+                    {
+                        'id': dish.id or uuid7(),
+                        'submenu_id': submenu_id,
+                        'title': dish.title,
+                        'description': dish.description,
+                        'price': dish.price,
+                    }
+                    for dish in submenu.dishes
+                )
+
+        if not await self.repo.import_catalog(menus, submenus, dishes):
+            raise make_conflict_error('catalog')
+
+        # Импортируются только новые меню: достаточно сбросить список меню
+        await invalidate_catalog([menu['id'] for menu in menus])
+
+        return CatalogImportResult(
+            menus_count=len(menus),
+            submenus_count=len(submenus),
+            dishes_count=len(dishes),
+        )
+
+    async def recount_counters(self) -> int:
+        fixed_rows = await self.repo.recount_counters()
+
+        if fixed_rows:
+            menus = await self.repo.read_menus()
+            await RedisCache.delete(
+                get_menu_list_key(),
+                *(get_menu_item_key(menu.id) for menu in menus),
+            )
+
+        return fixed_rows
 
     # Menu
 
-    async def read_menus(self) -> list[MenuSchema]:
-        cache_key = get_menu_list_key()
-        return await RedisCache.read(
+    async def read_menus(
+        self,
+        limit: int | None = None,
+        after: UUID | None = None,
+    ) -> CacheEntry:
+        limit = get_page_limit(limit, after)
+        cache_key = get_page_key(get_menu_list_key(), limit, after)
+        return await self.read_cached(
             cache_key,
             list[MenuSchema],
-            lambda: self.repo.read_menus(),
+            lambda repo: repo.read_menus(limit, after),
         )
 
-    async def read_menu(self, menu_id: UUID) -> MenuSchema:
+    async def read_menu(self, menu_id: UUID) -> CacheEntry:
         cache_key = get_menu_item_key(menu_id)
 
-        result = await RedisCache.read(
+        result = await self.read_cached(
             cache_key,
             MenuSchema,
-            lambda: self.repo.read_menu(menu_id),
+            lambda repo: repo.read_menu(menu_id),
         )
         if not result:
             raise make_not_found_error('menu')
@@ -51,58 +199,81 @@ class RestaurantService:
         return result
 
     async def create_menu(self, menu: MenuCreate) -> MenuSchema:
-        self.bg_tasks.add_task(invalidate_menu_list)
+        menu_row = await self.repo.create_menu(
+            {'title': menu.title, 'description': menu.description},
+        )
+        menu_schema = parse_obj_as(MenuSchema, menu_row)
+
+        if CACHE_WRITE_THROUGH:
+            await write_menu_through(menu_schema)
+        else:
+            await invalidate_menu_list()
 
-        menu_model = Menu(title=menu.title, description=menu.description)
-        menu_model = await self.repo.save_menu(menu_model, True)
+        await invalidate_export(menu_schema.id)
 
-        return parse_obj_as(MenuSchema, menu_model)
+        return menu_schema
 
     async def update_menu(
         self,
         menu_id: UUID,
         menu_update: MenuUpdate,
     ) -> MenuSchema:
-        self.bg_tasks.add_task(invalidate_menu_item, menu_id)
+        menu_row = await self.repo.update_menu(
+            menu_id,
+            {'title': menu_update.title, 'description': menu_update.description},
+        )
+        if not menu_row:
+            raise make_not_found_error('menu')
 
-        menu_model = await self.repo.read_menu(menu_id)
-        menu_model.title = menu_update.title
-        menu_model.description = menu_update.description
-        menu_model = await self.repo.save_menu(menu_model, False)
+        menu_schema = parse_obj_as(MenuSchema, menu_row)
 
-        return parse_obj_as(MenuSchema, menu_model)
+        if CACHE_WRITE_THROUGH:
+            await write_menu_through(menu_schema)
+        else:
+            await invalidate_menu_item(menu_id)
 
-    async def delete_menu(self, menu_id: UUID) -> dict[str, bool]:
-        self.bg_tasks.add_task(invalidate_menu_item, menu_id)
+        await invalidate_export(menu_id)
+
+        return menu_schema
 
+    async def delete_menu(self, menu_id: UUID) -> dict[str, bool]:
         result = await self.repo.delete_menu(menu_id)
 
         if not result:
             raise make_not_found_error('menu')
 
+        await invalidate_menu_item(menu_id)
+        await invalidate_export(menu_id)
+
         return {'ok': True}
 
     # Submenu
 
-    async def read_submenus(self, menu_id: UUID) -> list[SubmenuSchema]:
-        cache_key = get_submenu_list_key(menu_id)
-        return await RedisCache.read(
+    async def read_submenus(
+        self,
+        menu_id: UUID,
+        limit: int | None = None,
+        after: UUID | None = None,
+    ) -> CacheEntry:
+        limit = get_page_limit(limit, after)
+        cache_key = get_page_key(get_submenu_list_key(menu_id), limit, after)
+        return await self.read_cached(
             cache_key,
             list[SubmenuSchema],
-            lambda: self.repo.read_submenus(menu_id),
+            lambda repo: repo.read_submenus(menu_id, limit, after),
         )
 
     async def read_submenu(
         self,
         menu_id: UUID,
         submenu_id: UUID,
-    ) -> SubmenuSchema:
+    ) -> CacheEntry:
         cache_key = get_submenu_item_key(menu_id, submenu_id)
 
-        result = await RedisCache.read(
+        result = await self.read_cached(
             cache_key,
             SubmenuSchema,
-            lambda: self.repo.read_submenu(menu_id, submenu_id),
+            lambda repo: repo.read_submenu(menu_id, submenu_id),
         )
         if not result:
             raise make_not_found_error('submenu')
@@ -114,16 +285,23 @@ class RestaurantService:
         menu_id: UUID,
         submenu: SubmenuCreate,
     ) -> SubmenuSchema:
-        self.bg_tasks.add_task(invalidate_submenu_list, menu_id)
-
-        submenu_model = Submenu(
-            menu_id=menu_id,
-            title=submenu.title,
-            description=submenu.description,
+        submenu_row = await self.repo.create_submenu(
+            {
+                'menu_id': menu_id,
+                'title': submenu.title,
+                'description': submenu.description,
+            },
         )
-        submenu_model = await self.repo.save_submenu(submenu_model, True)
+        submenu_schema = parse_obj_as(SubmenuSchema, submenu_row)
 
-        return parse_obj_as(SubmenuSchema, submenu_model)
+        if CACHE_WRITE_THROUGH:
+            await write_submenu_through(menu_id, submenu_schema, True)
+        else:
+            await invalidate_submenu_list(menu_id)
+
+        await invalidate_export(menu_id)
+
+        return submenu_schema
 
     async def update_submenu(
         self,
@@ -131,27 +309,41 @@ class RestaurantService:
         submenu_id: UUID,
         submenu_update: SubmenuUpdate,
     ) -> SubmenuSchema:
-        self.bg_tasks.add_task(invalidate_submenu_item, menu_id, submenu_id)
+        submenu_row = await self.repo.update_submenu(
+            menu_id,
+            submenu_id,
+            {
+                'title': submenu_update.title,
+                'description': submenu_update.description,
+            },
+        )
+        if not submenu_row:
+            raise make_not_found_error('submenu')
+
+        submenu_schema = parse_obj_as(SubmenuSchema, submenu_row)
+
+        if CACHE_WRITE_THROUGH:
+            await write_submenu_through(menu_id, submenu_schema, False)
+        else:
+            await invalidate_submenu_item(menu_id, submenu_id)
 
-        submenu_model = await self.repo.read_submenu(menu_id, submenu_id)
-        submenu_model.title = submenu_update.title
-        submenu_model.description = submenu_update.description
-        submenu_model = await self.repo.save_submenu(submenu_model, False)
+        await invalidate_export(menu_id)
 
-        return parse_obj_as(SubmenuSchema, submenu_model)
+        return submenu_schema
 
     async def delete_submenu(
         self,
         menu_id: UUID,
         submenu_id: UUID,
     ) -> dict[str, bool]:
-        self.bg_tasks.add_task(invalidate_submenu_item, menu_id, submenu_id)
-
         result = await self.repo.delete_submenu(menu_id, submenu_id)
 
         if not result:
             raise make_not_found_error('submenu')
 
+        await invalidate_submenu_item(menu_id, submenu_id)
+        await invalidate_export(menu_id)
+
         return {'ok': True}
 
     # Dish
@@ -160,12 +352,15 @@ class RestaurantService:
         self,
         menu_id: UUID,
         submenu_id: UUID,
-    ) -> list[DishSchema]:
-        cache_key = get_dish_list_key(menu_id, submenu_id)
-        return await RedisCache.read(
+        limit: int | None = None,
+        after: UUID | None = None,
+    ) -> CacheEntry:
+        limit = get_page_limit(limit, after)
+        cache_key = get_page_key(get_dish_list_key(menu_id, submenu_id), limit, after)
+        return await self.read_cached(
             cache_key,
             list[DishSchema],
-            lambda: self.repo.read_dishes(submenu_id),
+            lambda repo: repo.read_dishes(submenu_id, limit, after),
         )
 
     async def read_dish(
@@ -173,13 +368,13 @@ class RestaurantService:
         menu_id: UUID,
         submenu_id: UUID,
         dish_id: UUID,
-    ) -> DishSchema:
+    ) -> CacheEntry:
         cache_key = get_dish_item_key(menu_id, submenu_id, dish_id)
 
-        result = await RedisCache.read(
+        result = await self.read_cached(
             cache_key,
             DishSchema,
-            lambda: self.repo.read_dish(submenu_id, dish_id),
+            lambda repo: repo.read_dish(submenu_id, dish_id),
         )
         if not result:
             raise make_not_found_error('dish')
@@ -192,17 +387,24 @@ class RestaurantService:
         submenu_id: UUID,
         dish: DishCreate,
     ) -> DishSchema:
-        self.bg_tasks.add_task(invalidate_dish_list, menu_id, submenu_id)
-
-        dish_model = Dish(
-            title=dish.title,
-            description=dish.description,
-            price=dish.price,
-            submenu_id=submenu_id,
+        dish_row = await self.repo.create_dish(
+            {
+                'title': dish.title,
+                'description': dish.description,
+                'price': dish.price,
+                'submenu_id': submenu_id,
+            },
         )
-        dish_model = await self.repo.save_dish(dish_model, True)
+        dish_schema = parse_obj_as(DishSchema, dish_row)
+
+        if CACHE_WRITE_THROUGH:
+            await write_dish_through(menu_id, dish_schema, True)
+        else:
+            await invalidate_dish_list(menu_id, submenu_id)
 
-        return parse_obj_as(DishSchema, dish_model)
+        await invalidate_export(menu_id)
+
+        return dish_schema
 
     async def update_dish(
         self,
@@ -211,15 +413,69 @@ class RestaurantService:
         dish_id: UUID,
         dish_update: DishUpdate,
     ) -> DishSchema:
-        self.bg_tasks.add_task(invalidate_dish_item, menu_id, submenu_id, dish_id)
+        dish_row = await self.repo.update_dish(
+            submenu_id,
+            dish_id,
+            {
+                'title': dish_update.title,
+                'description': dish_update.description,
+                'price': dish_update.price,
+            },
+        )
+        if not dish_row:
+            raise make_not_found_error('dish')
 
-        dish_model = await self.repo.read_dish(submenu_id, dish_id)
-        dish_model.title = dish_update.title
-        dish_model.description = dish_update.description
-        dish_model.price = dish_update.price
-        dish_model = await self.repo.save_dish(dish_model, False)
+        dish_schema = parse_obj_as(DishSchema, dish_row)
 
-        return parse_obj_as(DishSchema, dish_model)
+        if CACHE_WRITE_THROUGH:
+            await write_dish_through(menu_id, dish_schema, False)
+        else:
+            await invalidate_dish_item(menu_id, submenu_id, dish_id)
+
+        await invalidate_export(menu_id)
+
+        return dish_schema
+
+    async def apply_dish_batch(
+        self,
+        menu_id: UUID,
+        submenu_id: UUID,
+        batch: DishBatch,
+    ) -> DishBatchResult:
+        creates = [
+            {
+                'id': uuid7(),
+                'submenu_id': submenu_id,
+                'title': dish.title,
+                'description': dish.description,
+                'price': dish.price,
+            }
+            for dish in batch.create
+        ]
+        updates = [dish.dict() for dish in batch.update]
+
+        result = await self.repo.apply_dish_batch(
+            submenu_id,
+            creates,
+            updates,
+            batch.delete,
+        )
+        if result is None:
+            raise make_conflict_error('dish batch')
+
+        created, updated, deleted = result
+
+        # Вместо каскада на каждое блюдо - один сброс ключей подменю и меню:
+        # ключи блюд лежат в пространстве подменю и сбрасываются вместе с ним
+        if created or updated or deleted:
+            await invalidate_dish_list(menu_id, submenu_id)
+            await invalidate_export(menu_id)
+
+        return DishBatchResult(
+            created=parse_obj_as(list[DishSchema], created),
+            updated=parse_obj_as(list[DishSchema], updated),
+            deleted=deleted,
+        )
 
     async def delete_dish(
         self,
@@ -227,13 +483,14 @@ class RestaurantService:
         submenu_id: UUID,
         dish_id: UUID,
     ) -> dict[str, bool]:
-        self.bg_tasks.add_task(invalidate_dish_item, menu_id, submenu_id, dish_id)
-
         result = await self.repo.delete_dish(submenu_id, dish_id)
 
         if not result:
             raise make_not_found_error('dish')
 
+        await invalidate_dish_item(menu_id, submenu_id, dish_id)
+        await invalidate_export(menu_id)
+
         return {'ok': True}
 
 
@@ -261,38 +518,175 @@ def get_dish_item_key(menu_id: UUID, submenu_id: UUID, dish_id: UUID) -> str:
     return f'{get_dish_list_key(menu_id, submenu_id)}/{dish_id}'
 
 
+# Страница списка - отдельный ключ в пространстве списка:
+# она сбрасывается при любой инвалидации самого списка
+def get_page_key(list_key: str, limit: int | None, after: UUID | None) -> str:
+    if limit is None:
+        return list_key
+
+    return f"{list_key}?limit={limit}&after={after or ''}"
+
+
+def get_page_limit(limit: int | None, after: UUID | None) -> int | None:
+    # Без параметров отдается весь список, как раньше
+    if limit is None and after is not None:
+        return PAGE_LIMIT_DEFAULT
+
+    return limit
+
+
 # Clear funcs
 
+# Каждая мутация собирает полный набор затронутых ключей
+# и инвалидирует их за один запрос к Redis
+
+def get_menu_list_affected_keys() -> list[str]:
+    return [get_menu_list_key()]
+
+
+def get_menu_item_affected_keys(menu_id: UUID) -> list[str]:
+    return [get_menu_item_key(menu_id), *get_menu_list_affected_keys()]
+
+
+def get_submenu_list_affected_keys(menu_id: UUID) -> list[str]:
+    return [
+        get_submenu_list_key(menu_id),
+        *get_menu_item_affected_keys(menu_id),
+    ]
+
+
+def get_submenu_item_affected_keys(menu_id: UUID, submenu_id: UUID) -> list[str]:
+    return [
+        get_submenu_item_key(menu_id, submenu_id),
+        *get_submenu_list_affected_keys(menu_id),
+    ]
+
+
+def get_dish_list_affected_keys(menu_id: UUID, submenu_id: UUID) -> list[str]:
+    return [
+        get_dish_list_key(menu_id, submenu_id),
+        *get_submenu_item_affected_keys(menu_id, submenu_id),
+    ]
+
+
+def get_dish_item_affected_keys(
+    menu_id: UUID,
+    submenu_id: UUID,
+    dish_id: UUID,
+) -> list[str]:
+    return [
+        get_dish_item_key(menu_id, submenu_id, dish_id),
+        *get_dish_list_affected_keys(menu_id, submenu_id),
+    ]
+
+
 async def invalidate_menu_list() -> None:
     print('invalidate_menu_list')
-    await RedisCache.delete(get_menu_list_key())
+    await RedisCache.delete(*get_menu_list_affected_keys())
 
 
 async def invalidate_submenu_list(menu_id: UUID) -> None:
     print('invalidate_submenu_list')
-    await RedisCache.delete(get_submenu_list_key(menu_id))
-    await invalidate_menu_item(menu_id)
+    await RedisCache.delete(*get_submenu_list_affected_keys(menu_id))
 
 
 async def invalidate_dish_list(menu_id: UUID, submenu_id: UUID) -> None:
     print('invalidate_dish_list')
-    await RedisCache.delete(get_dish_list_key(menu_id, submenu_id))
-    await invalidate_submenu_item(menu_id, submenu_id)
+    await RedisCache.delete(*get_dish_list_affected_keys(menu_id, submenu_id))
 
 
 async def invalidate_menu_item(menu_id: UUID) -> None:
     print('invalidate_menu_item')
-    await RedisCache.delete(get_menu_item_key(menu_id))
-    await invalidate_menu_list()
+    await RedisCache.delete(*get_menu_item_affected_keys(menu_id))
 
 
 async def invalidate_submenu_item(menu_id: UUID, submenu_id: UUID) -> None:
     print('invalidate_submenu_item')
-    await RedisCache.delete(get_submenu_item_key(menu_id, submenu_id))
-    await invalidate_submenu_list(menu_id)
+    await RedisCache.delete(*get_submenu_item_affected_keys(menu_id, submenu_id))
 
 
 async def invalidate_dish_item(menu_id: UUID, submenu_id: UUID, dish_id: UUID) -> None:
     print('invalidate_dish_item')
-    await RedisCache.delete(get_dish_item_key(menu_id, submenu_id, dish_id))
-    await invalidate_dish_list(menu_id, submenu_id)
+    await RedisCache.delete(
+        *get_dish_item_affected_keys(menu_id, submenu_id, dish_id),
+    )
+
+
+async def invalidate_export(menu_id: UUID) -> None:
+    print('invalidate_export')
+    await RedisCache.invalidate_export(menu_id)
+
+
+async def invalidate_catalog(menu_ids: list[UUID]) -> None:
+    print('invalidate_catalog')
+    await RedisCache.delete(*get_menu_list_affected_keys())
+    await RedisCache.invalidate_export(*menu_ids)
+
+
+# Write-through funcs
+
+async def write_menu_through(menu: MenuSchema) -> None:
+    print('write_menu_through')
+    body = dump_body(menu)
+
+    await RedisCache.write_through([
+        make_set_op(get_menu_item_key(menu.id), body),
+        make_upsert_op(get_menu_list_key(), body),
+    ])
+
+
+async def write_submenu_through(
+    menu_id: UUID,
+    submenu: SubmenuSchema,
+    is_new: bool,
+) -> None:
+    print('write_submenu_through')
+    body = dump_body(submenu)
+    ops = [
+        make_set_op(get_submenu_item_key(menu_id, submenu.id), body),
+        make_upsert_op(get_submenu_list_key(menu_id), body),
+    ]
+
+    if is_new:
+        ops += [
+            make_incr_op(get_menu_item_key(menu_id), 'submenus_count', 1),
+            make_incr_op(get_menu_list_key(), 'submenus_count', 1, menu_id),
+        ]
+
+    await RedisCache.write_through(ops)
+
+
+async def write_dish_through(
+    menu_id: UUID,
+    dish: DishSchema,
+    is_new: bool,
+) -> None:
+    print('write_dish_through')
+    submenu_id = dish.submenu_id
+    body = dump_body(dish)
+    ops = [
+        make_set_op(get_dish_item_key(menu_id, submenu_id, dish.id), body),
+        make_upsert_op(get_dish_list_key(menu_id, submenu_id), body),
+    ]
+
+    if is_new:
+        ops += [
+            make_incr_op(get_submenu_item_key(menu_id, submenu_id), 'dishes_count', 1),
+            make_incr_op(get_submenu_list_key(menu_id), 'dishes_count', 1, submenu_id),
+            make_incr_op(get_menu_item_key(menu_id), 'dishes_count', 1),
+            make_incr_op(get_menu_list_key(), 'dishes_count', 1, menu_id),
+        ]
+
+    await RedisCache.write_through(ops)
+
+
+async def warm_up_cache() -> int:
+    # Прогрев идет вне запроса и без окна после записи: каталог читается из основной БД
+    with reading_from_primary():
+        async with async_session() as db:
+            return await RestaurantService(RestaurantRepository(db)).warm_up_cache()
+
+
+async def recount_counters() -> int:
+    async with async_session() as db:
+        return await RestaurantService(RestaurantRepository(db)).recount_counters()
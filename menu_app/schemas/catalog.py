@@ -0,0 +1,30 @@
+from uuid import UUID
+
+from menu_app.schemas.dish import DishBase
+from menu_app.schemas.menu import MenuBase
+from menu_app.schemas.submenu import SubmenuBase
+from pydantic import BaseModel
+
+
+class DishImport(DishBase):
+    id: UUID | None = None
+
+
+class SubmenuImport(SubmenuBase):
+    id: UUID | None = None
+    dishes: list[DishImport] = []
+
+
+class MenuImport(MenuBase):
+    id: UUID | None = None
+    submenus: list[SubmenuImport] = []
+
+
+class CatalogImport(BaseModel):
+    menus: list[MenuImport]
+
+
+class CatalogImportResult(BaseModel):
+    menus_count: int
+    submenus_count: int
+    dishes_count: int
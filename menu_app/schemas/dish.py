@@ -25,3 +25,23 @@ class DishUpdate(BaseModel):
     title: str
     description: str | None = None
     price: str | None = None
+
+
+class DishBatchUpdate(BaseModel):
+    # Не переданные поля не меняются
+    id: UUID
+    title: str | None = None
+    description: str | None = None
+    price: str | None = None
+
+
+class DishBatch(BaseModel):
+    create: list[DishCreate] = []
+    update: list[DishBatchUpdate] = []
+    delete: list[UUID] = []
+
+
+class DishBatchResult(BaseModel):
+    created: list[Dish]
+    updated: list[Dish]
+    deleted: list[UUID]
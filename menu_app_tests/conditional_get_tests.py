@@ -0,0 +1,100 @@
+import hashlib
+
+import requests
+from menu_app_tests import APP_ROOT_URL
+
+menu_id = None
+submenu_id = None
+dish_id = None
+
+
+def get_etag(resp: requests.Response) -> str:
+    # Сильный ETag - хеш отданного тела
+    etag = resp.headers['etag']
+
+    assert etag == f'"{hashlib.sha1(resp.content).hexdigest()}"'
+
+    return etag
+
+
+def test_create_catalog() -> None:
+    global menu_id, submenu_id, dish_id
+
+    menu_id = requests.post(
+        APP_ROOT_URL,
+        json={'title': 'Меню киоска', 'description': ''},
+    ).json()['id']
+    submenu_id = requests.post(
+        f'{APP_ROOT_URL}/{menu_id}/submenus',
+        json={'title': 'Подменю киоска', 'description': ''},
+    ).json()['id']
+    dish_id = requests.post(
+        f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}/dishes',
+        json={'title': 'Блюдо киоска', 'description': '', 'price': '10.00'},
+    ).json()['id']
+
+
+def test_read_endpoints_answer_not_modified() -> None:
+    dishes_url = f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}/dishes'
+    urls = [
+        APP_ROOT_URL,
+        f'{APP_ROOT_URL}/{menu_id}',
+        f'{APP_ROOT_URL}/{menu_id}/submenus',
+        f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}',
+        dishes_url,
+        f'{dishes_url}/{dish_id}',
+        f'{dishes_url}?limit=1',
+    ]
+
+    for url in urls:
+        etag = get_etag(requests.get(url))
+
+        for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            resp = requests.get(url, headers={'If-None-Match': if_none_match})
+
+            assert resp.status_code == 304
+            assert resp.content == b''
+            assert resp.headers['etag'] == etag
+
+        assert requests.get(url, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_etag_changes_after_updating() -> None:
+    dish_url = f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}'
+    dishes_url = f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}/dishes'
+
+    dish_etag = get_etag(requests.get(dish_url))
+    dishes_etag = get_etag(requests.get(dishes_url))
+    menu_etag = get_etag(requests.get(f'{APP_ROOT_URL}/{menu_id}'))
+
+    requests.patch(
+        dish_url,
+        json={'title': 'Блюдо киоска', 'description': 'Новое', 'price': '12.00'},
+    )
+    requests.post(
+        dishes_url,
+        json={'title': 'Второе блюдо киоска', 'description': '', 'price': '1.00'},
+    )
+
+    dish_resp = requests.get(dish_url, headers={'If-None-Match': dish_etag})
+    dishes_resp = requests.get(dishes_url, headers={'If-None-Match': dishes_etag})
+    menu_resp = requests.get(f'{APP_ROOT_URL}/{menu_id}', headers={'If-None-Match': menu_etag})
+
+    assert dish_resp.status_code == 200
+    assert dish_resp.json()['price'] == '12.00'
+    assert get_etag(dish_resp) != dish_etag
+
+    assert dishes_resp.status_code == 200
+    assert len(dishes_resp.json()) == 2
+    assert get_etag(dishes_resp) != dishes_etag
+
+    # Счетчик блюд меню изменился
+    assert menu_resp.status_code == 200
+    assert menu_resp.json()['dishes_count'] == 2
+    assert get_etag(menu_resp) != menu_etag
+
+
+def test_delete_catalog() -> None:
+    resp = requests.delete(f'{APP_ROOT_URL}/{menu_id}')
+
+    assert resp.status_code == 200
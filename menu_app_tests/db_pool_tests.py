@@ -0,0 +1,54 @@
+import os
+
+import pytest
+import requests
+from menu_app.database import (
+    SQLALCHEMY_DATABASE_URL,
+    get_engine_stats,
+    make_engine,
+)
+from menu_app_tests import APP_ROOT_URL
+from sqlalchemy.sql import text
+
+LOCAL_URL = os.getenv('LOCAL_URL')
+db_pool_url = f'{LOCAL_URL}/api/v1/db/pool'
+
+
+def test_read_db_pool_stats() -> None:
+    stats = requests.get(db_pool_url).json()
+
+    menu_id = requests.post(
+        APP_ROOT_URL,
+        json={'title': 'Меню пула', 'description': ''},
+    ).json()['id']
+    requests.delete(f'{APP_ROOT_URL}/{menu_id}')
+
+    new_stats = requests.get(db_pool_url).json()
+
+    assert new_stats['checkouts'] >= stats['checkouts'] + 2
+    assert new_stats['acquires'] >= new_stats['checkouts']
+    assert new_stats['checked_out'] == 0
+    assert new_stats['size'] > 0
+    assert new_stats['timeouts'] == 0
+    assert new_stats['replica_pools'] == []
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_are_per_engine() -> None:
+    # Вместо реплики - второй движок на ту же БД: считаются только его выдачи
+    primary = make_engine(SQLALCHEMY_DATABASE_URL)
+    replica = make_engine(SQLALCHEMY_DATABASE_URL)
+
+    try:
+        for _ in range(3):
+            async with replica.connect() as conn:
+                await conn.execute(text('SELECT 1'))
+    finally:
+        await replica.dispose()
+        await primary.dispose()
+
+    replica_stats = get_engine_stats(replica)
+
+    assert get_engine_stats(primary)['checkouts'] == 0
+    assert replica_stats['checkouts'] == 3
+    assert replica_stats['acquires'] >= 3
@@ -0,0 +1,101 @@
+import requests
+from menu_app_tests import APP_ROOT_URL
+
+menu_id = None
+submenu_id = None
+dish_ids = []
+
+
+def dishes_url() -> str:
+    return f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}/dishes'
+
+
+def test_create_menu_and_submenu(menu_data_to_create, submenu_data_to_create) -> None:
+    global menu_id, submenu_id
+
+    menu_id = requests.post(APP_ROOT_URL, json=menu_data_to_create).json()['id']
+    submenu_id = requests.post(
+        f'{APP_ROOT_URL}/{menu_id}/submenus',
+        json=submenu_data_to_create,
+    ).json()['id']
+
+
+def test_create_dishes(dish_1_data_to_create, dish_2_data_to_create) -> None:
+    for dish_data in (dish_1_data_to_create, dish_2_data_to_create):
+        created_dish_resp = requests.post(dishes_url(), json=dish_data)
+
+        assert created_dish_resp.status_code == 201
+        dish_ids.append(created_dish_resp.json()['id'])
+
+    # Прогревает кэш списка и счетчиков перед пакетом
+    assert len(requests.get(dishes_url()).json()) == 2
+    assert requests.get(f'{APP_ROOT_URL}/{menu_id}').json()['dishes_count'] == 2
+
+
+def test_apply_dish_batch() -> None:
+    batch_resp = requests.post(
+        f'{dishes_url()}/batch',
+        json={
+            'create': [{'title': 'Пакетное блюдо', 'description': 'Из пакета', 'price': '50.00'}],
+            'update': [{'id': dish_ids[0], 'price': '99.99'}],
+            'delete': [dish_ids[1]],
+        },
+    )
+    batch_result = batch_resp.json()
+
+    assert batch_resp.status_code == 200
+    assert [dish['title'] for dish in batch_result['created']] == ['Пакетное блюдо']
+    assert [(dish['id'], dish['price']) for dish in batch_result['updated']] == [
+        (dish_ids[0], '99.99'),
+    ]
+    assert batch_result['deleted'] == [dish_ids[1]]
+
+
+def test_read_dishes_after_batch() -> None:
+    dishes = requests.get(dishes_url()).json()
+
+    assert sorted(dish['price'] for dish in dishes) == ['50.00', '99.99']
+    assert requests.get(f'{dishes_url()}/{dish_ids[0]}').json()['price'] == '99.99'
+    assert requests.get(f'{dishes_url()}/{dish_ids[1]}').status_code == 404
+    assert requests.get(f'{APP_ROOT_URL}/{menu_id}').json()['dishes_count'] == 2
+    submenu = requests.get(f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}').json()
+
+    assert submenu['dishes_count'] == 2
+
+
+def test_apply_conflicting_dish_batch() -> None:
+    batch_resp = requests.post(
+        f'{dishes_url()}/batch',
+        json={
+            'create': [{'title': 'Пакетное блюдо', 'description': 'Дубль', 'price': '1.00'}],
+            'delete': [dish_ids[0]],
+        },
+    )
+
+    assert batch_resp.status_code == 409
+    assert requests.get(f'{dishes_url()}/{dish_ids[0]}').status_code == 200
+
+
+def test_apply_dish_batch_reusing_deleted_title(dish_1_data_to_create) -> None:
+    # Удаление выполняется до вставки, поэтому название удаленного блюда свободно
+    batch_resp = requests.post(
+        f'{dishes_url()}/batch',
+        json={
+            'create': [{**dish_1_data_to_create, 'description': 'На месте удаленного'}],
+            'delete': [dish_ids[0]],
+        },
+    )
+    batch_result = batch_resp.json()
+    dishes = requests.get(dishes_url()).json()
+
+    assert batch_resp.status_code == 200
+    assert batch_result['deleted'] == [dish_ids[0]]
+    assert [dish['title'] for dish in batch_result['created']] == [dish_1_data_to_create['title']]
+    assert sorted(dish['description'] for dish in dishes) == ['Из пакета', 'На месте удаленного']
+    assert requests.get(f'{APP_ROOT_URL}/{menu_id}').json()['dishes_count'] == 2
+
+
+def test_delete_menu() -> None:
+    resp = requests.delete(f'{APP_ROOT_URL}/{menu_id}')
+
+    assert resp.status_code == 200
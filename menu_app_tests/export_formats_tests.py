@@ -0,0 +1,187 @@
+import csv
+import io
+import json
+import os
+
+import openpyxl
+import pytest
+import requests
+from menu_app.redis_cache import (
+    EXPORT_SECTION_KEY_PREFIX,
+    EXPORT_SNAPSHOT_KEY,
+    EXPORT_SNAPSHOT_TTL,
+    redis,
+)
+from menu_app_tests import APP_ROOT_URL
+from pyarrow import parquet
+
+LOCAL_URL = os.getenv('LOCAL_URL')
+menu_content_url = f'{LOCAL_URL}/api/v1/export'
+
+menu_id = None
+submenu_id = None
+dish_id = None
+
+
+def test_create_catalog() -> None:
+    global menu_id, submenu_id, dish_id
+
+    menu_id = requests.post(
+        APP_ROOT_URL,
+        json={'title': 'Меню, "особое"', 'description': 'Колонки\tи строки'},
+    ).json()['id']
+    submenu_id = requests.post(
+        f'{APP_ROOT_URL}/{menu_id}/submenus',
+        json={'title': 'Закуски', 'description': 'Холодные'},
+    ).json()['id']
+    dish_id = requests.post(
+        f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}/dishes',
+        json={'title': 'Сельдь', 'description': 'С луком\nи картофелем', 'price': '182.99'},
+    ).json()['id']
+
+
+def test_export_csv() -> None:
+    resp = requests.get(menu_content_url, params={'format': 'csv'})
+
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('text/csv')
+    assert list(csv.reader(io.StringIO(resp.text))) == [
+        [menu_id, 'Меню, "особое"', 'Колонки\tи строки', '', '', ''],
+        ['', submenu_id, 'Закуски', 'Холодные', '', ''],
+        ['', '', dish_id, 'Сельдь', 'С луком\nи картофелем', '182.99'],
+    ]
+
+
+def test_export_jsonl() -> None:
+    resp = requests.get(menu_content_url, params={'format': 'jsonl'})
+    records = [json.loads(line) for line in resp.text.splitlines()]
+
+    assert resp.status_code == 200
+    assert records == [
+        {
+            'menu_id': menu_id,
+            'menu_title': 'Меню, "особое"',
+            'menu_description': 'Колонки\tи строки',
+            'submenu_id': submenu_id,
+            'submenu_title': 'Закуски',
+            'submenu_description': 'Холодные',
+            'dish_id': dish_id,
+            'dish_title': 'Сельдь',
+            'dish_description': 'С луком\nи картофелем',
+            'dish_price': 182.99,
+        },
+    ]
+
+
+def test_export_xlsx() -> None:
+    resp = requests.get(menu_content_url, params={'format': 'xlsx'})
+    workbook = openpyxl.load_workbook(io.BytesIO(resp.content))
+
+    assert resp.status_code == 200
+    assert list(workbook.active.values) == [
+        (menu_id, 'Меню, "особое"', 'Колонки\tи строки', None, None, None),
+        (None, submenu_id, 'Закуски', 'Холодные', None, None),
+        (None, None, dish_id, 'Сельдь', 'С луком\nи картофелем', 182.99),
+    ]
+
+
+def test_export_parquet() -> None:
+    resp = requests.get(menu_content_url, params={'format': 'parquet'})
+    records = parquet.read_table(io.BytesIO(resp.content)).to_pylist()
+
+    assert resp.status_code == 200
+    assert [(record['dish_id'], str(record['dish_price'])) for record in records] == [
+        (dish_id, '182.99'),
+    ]
+
+
+def test_export_unknown_format() -> None:
+    resp = requests.get(menu_content_url, params={'format': 'xml'})
+
+    assert resp.status_code == 422
+
+
+def test_export_not_modified() -> None:
+    resp = requests.get(menu_content_url)
+    etag = resp.headers['etag']
+
+    assert resp.status_code == 200
+    assert dish_id in resp.text
+
+    # Тег снимка сравнивается так же, как у остальных ответов: слабо и по списку
+    for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+        not_modified_resp = requests.get(
+            menu_content_url,
+            headers={'If-None-Match': if_none_match},
+        )
+
+        assert not_modified_resp.status_code == 304
+        assert not_modified_resp.headers['etag'] == etag
+
+
+@pytest.mark.asyncio
+async def test_export_snapshot_expires() -> None:
+    # Записи в обход сервиса не меняют версию каталога: снимок ограничен TTL
+    requests.get(menu_content_url)
+
+    try:
+        section_ttl = await redis.ttl(f'{EXPORT_SECTION_KEY_PREFIX}{menu_id}')
+        snapshot_ttl = await redis.ttl(EXPORT_SNAPSHOT_KEY)
+    finally:
+        await redis.connection_pool.disconnect()
+
+    assert 0 < section_ttl <= EXPORT_SNAPSHOT_TTL
+    assert 0 < snapshot_ttl <= EXPORT_SNAPSHOT_TTL
+
+
+def test_export_after_updating() -> None:
+    etag = requests.get(menu_content_url).headers['etag']
+
+    updated_dish_resp = requests.patch(
+        f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}',
+        json={'title': 'Сельдь под шубой', 'description': 'Слоями', 'price': '199.99'},
+    )
+
+    assert updated_dish_resp.status_code == 200
+
+    resp = requests.get(menu_content_url, headers={'If-None-Match': etag})
+
+    assert resp.status_code == 200
+    assert resp.headers['etag'] != etag
+    assert resp.text.split('\n')[2] == f'\t\t{dish_id}\tСельдь под шубой\tСлоями\t199.99'
+
+
+def test_export_empty_menu_and_submenu() -> None:
+    empty_menu_id = requests.post(
+        APP_ROOT_URL,
+        json={'title': 'Пустое меню', 'description': 'Без подменю'},
+    ).json()['id']
+    empty_submenu_id = requests.post(
+        f'{APP_ROOT_URL}/{menu_id}/submenus',
+        json={'title': 'Пустое подменю', 'description': 'Без блюд'},
+    ).json()['id']
+
+    export_rows = requests.get(menu_content_url).text.split('\n')
+
+    assert f'\t{empty_submenu_id}\tПустое подменю\tБез блюд\t\t' in export_rows
+    assert f'{empty_menu_id}\tПустое меню\tБез подменю\t\t\t' in export_rows
+
+    records = [
+        json.loads(line)
+        for line in requests.get(menu_content_url, params={'format': 'jsonl'}).text.splitlines()
+    ]
+
+    empty_menu_record = next(record for record in records if record['menu_id'] == empty_menu_id)
+
+    assert empty_menu_record['submenu_id'] is None
+    assert empty_menu_record['dish_id'] is None
+
+    resp = requests.delete(f'{APP_ROOT_URL}/{empty_menu_id}')
+
+    assert resp.status_code == 200
+
+
+def test_delete_catalog() -> None:
+    resp = requests.delete(f'{APP_ROOT_URL}/{menu_id}')
+
+    assert resp.status_code == 200
@@ -0,0 +1,130 @@
+import tracemalloc
+from collections.abc import AsyncIterator, Callable
+
+import pytest
+from menu_app.database import SQLALCHEMY_DATABASE_URL
+from menu_app.redis_cache import redis
+from menu_app.restaurant_export import (
+    EXPORT_WRITERS,
+    ExportFormat,
+    is_export_format_available,
+    read_export_snapshot,
+)
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+SUBMENUS_PER_MENU_COUNT = 20
+DISHES_PER_SUBMENU_COUNT = 50
+
+
+class TestExportMemory:
+    async def insert_menus(self, db: AsyncSession, first_number: int, last_number: int) -> None:
+        await db.execute(
+            text(
+                "INSERT INTO menus (id, title, description) \
+                SELECT gen_random_uuid(), 'Меню ' || n, 'Описание меню ' || n \
+                FROM generate_series( \
+                    CAST(:first_number AS integer), CAST(:last_number AS integer) \
+                ) AS n"
+            ),
+            {'first_number': first_number, 'last_number': last_number},
+        )
+        await db.execute(
+            text(
+                "INSERT INTO submenus (id, menu_id, title, description) \
+                SELECT gen_random_uuid(), menus.id, \
+                menus.title || ' подменю ' || n, 'Описание подменю' \
+                FROM menus, generate_series(1, :count) AS n \
+                WHERE menus.submenus_count = 0"
+            ),
+            {'count': SUBMENUS_PER_MENU_COUNT},
+        )
+        await db.execute(
+            text(
+                "INSERT INTO dishes (id, submenu_id, title, description, price) \
+                SELECT gen_random_uuid(), submenus.id, submenus.title || ' блюдо ' || n, \
+                repeat('Описание блюда ', 5), n + 0.99 \
+                FROM submenus, generate_series(1, :count) AS n \
+                WHERE submenus.dishes_count = 0"
+            ),
+            {'count': DISHES_PER_SUBMENU_COUNT},
+        )
+        await db.commit()
+
+    async def read_snapshot(self, db: AsyncSession) -> AsyncIterator[str]:
+        # Снимок собирается с нуля или из разделов в Redis - память не растет ни там, ни там
+        _, body = await read_export_snapshot(db)
+        async for chunk in body:
+            yield chunk
+
+    async def export(
+        self,
+        db: AsyncSession,
+        export_writer: Callable[[AsyncSession], AsyncIterator],
+    ) -> tuple[int, int]:
+        export_size = 0
+
+        tracemalloc.start()
+        async for chunk in export_writer(db):
+            export_size += len(chunk.encode() if isinstance(chunk, str) else chunk)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        await db.rollback()
+
+        return export_size, peak_memory
+
+    async def check_export_memory(
+        self,
+        export_writer: Callable[[AsyncSession], AsyncIterator],
+    ) -> tuple[int, int, int, int]:
+        engine = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+
+        async with sessionmaker(engine, class_=AsyncSession)() as db:
+            try:
+                await self.insert_menus(db, 1, 10)
+                small_export_size, small_peak_memory = await self.export(db, export_writer)
+
+                await self.insert_menus(db, 11, 40)
+                large_export_size, large_peak_memory = await self.export(db, export_writer)
+            finally:
+                await db.execute(text('DELETE FROM menus'))
+                await db.commit()
+
+        await engine.dispose()
+        await redis.connection_pool.disconnect()
+
+        return small_export_size, small_peak_memory, large_export_size, large_peak_memory
+
+    @pytest.mark.asyncio
+    async def test_snapshot_memory_is_bounded(self) -> None:
+        (
+            small_export_size,
+            small_peak_memory,
+            large_export_size,
+            large_peak_memory,
+        ) = await self.check_export_memory(self.read_snapshot)
+
+        # Каталог вырос вчетверо, а пик памяти - пачка разделов - нет
+        assert large_export_size > small_export_size * 3
+        assert large_peak_memory < small_peak_memory * 1.5
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('export_format', list(ExportFormat))
+    async def test_export_memory_is_bounded(self, export_format: ExportFormat) -> None:
+        if not is_export_format_available(export_format):
+            pytest.skip(f'{export_format.value} export needs the export extra')
+
+        # Без снимка: выгрузка идет потоком из БД, как при EXPORT_SNAPSHOT_ENABLED=0
+        (
+            small_export_size,
+            small_peak_memory,
+            large_export_size,
+            large_peak_memory,
+        ) = await self.check_export_memory(EXPORT_WRITERS[export_format])
+
+        # Каталог вырос вчетверо, а пик памяти - размер одной пачки строк - нет
+        assert large_export_size > small_export_size * 3
+        assert large_peak_memory < small_peak_memory * 1.5
@@ -0,0 +1,61 @@
+import time
+from uuid import UUID
+
+import pytest
+import requests
+from menu_app.database import SQLALCHEMY_DATABASE_URL
+from menu_app.models.ids import uuid7
+from menu_app_tests import APP_ROOT_URL
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+
+def get_timestamp(value: UUID) -> int:
+    return value.int >> 80
+
+
+def test_uuid7_is_time_ordered() -> None:
+    started_at = time.time_ns() // 1_000_000
+    ids = [uuid7() for _ in range(10_000)]
+
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert {value.version for value in ids} == {7}
+    assert {value.variant for value in ids} == {ids[0].variant}
+    assert abs(get_timestamp(ids[0]) - started_at) < 1000
+
+
+def test_created_ids_follow_creation_order() -> None:
+    menu_ids = [
+        UUID(
+            requests.post(
+                APP_ROOT_URL,
+                json={'title': f'Меню ключей {number}', 'description': ''},
+            ).json()['id'],
+        )
+        for number in range(3)
+    ]
+
+    for menu_id in menu_ids:
+        requests.delete(f'{APP_ROOT_URL}/{menu_id}')
+
+    assert menu_ids == sorted(menu_ids)
+    assert {menu_id.version for menu_id in menu_ids} == {7}
+
+
+@pytest.mark.asyncio
+async def test_server_side_uuid7() -> None:
+    engine = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+    started_at = time.time_ns() // 1_000_000
+
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text('SELECT uuid_generate_v7() FROM generate_series(1, 3)'),
+        )
+        ids = result.scalars().all()
+
+    await engine.dispose()
+
+    assert {value.version for value in ids} == {7}
+    assert abs(get_timestamp(ids[0]) - started_at) < 1000
@@ -0,0 +1,129 @@
+import os
+
+import requests
+from menu_app_tests import APP_ROOT_URL
+
+LOCAL_URL = os.getenv('LOCAL_URL')
+import_url = f'{LOCAL_URL}/api/v1/import'
+menu_content_url = f'{LOCAL_URL}/api/v1/export'
+
+catalog = {
+    'menus': [
+        {
+            'title': f'Импорт меню {menu_number}',
+            'description': 'Меню из импорта',
+            'submenus': [
+                {
+                    'title': f'Импорт подменю {menu_number}.{submenu_number}',
+                    'description': 'Подменю из импорта',
+                    'dishes': [
+                        {
+                            'title': f'Импорт блюда {menu_number}.{submenu_number}.{dish_number}',
+                            'description': 'Блюдо из импорта',
+                            'price': '10.50',
+                        }
+                        for dish_number in range(10)
+                    ],
+                }
+                for submenu_number in range(3)
+            ],
+        }
+        for menu_number in range(2)
+    ],
+}
+export_text = None
+
+
+def test_read_empty_menus_list() -> None:
+    assert requests.get(APP_ROOT_URL).json() == []
+
+
+def test_import_tree() -> None:
+    resp = requests.post(import_url, json=catalog)
+
+    assert resp.status_code == 201
+    assert resp.json() == {'menus_count': 2, 'submenus_count': 6, 'dishes_count': 60}
+
+    menus = requests.get(APP_ROOT_URL).json()
+
+    assert len(menus) == 2
+    assert all(menu['submenus_count'] == 3 for menu in menus)
+    assert all(menu['dishes_count'] == 30 for menu in menus)
+
+
+def test_import_conflict() -> None:
+    resp = requests.post(import_url, json=catalog)
+
+    assert resp.status_code == 409
+    assert len(requests.get(APP_ROOT_URL).json()) == 2
+
+
+def test_delete_imported_menus() -> None:
+    global export_text
+    export_text = requests.get(menu_content_url).text
+
+    for menu in requests.get(APP_ROOT_URL).json():
+        resp = requests.delete(f"{APP_ROOT_URL}/{menu['id']}")
+
+        assert resp.status_code == 200
+
+
+def test_import_tsv() -> None:
+    resp = requests.post(
+        import_url,
+        data=export_text.encode(),
+        headers={'Content-Type': 'text/tab-separated-values'},
+    )
+
+    assert resp.status_code == 201
+    assert resp.json() == {'menus_count': 2, 'submenus_count': 6, 'dishes_count': 60}
+    assert requests.get(menu_content_url).text == export_text
+
+
+def test_import_invalid_tree() -> None:
+    resp = requests.post(import_url, json={'menus': [{'description': 'Без названия'}]})
+
+    assert resp.status_code == 422
+
+
+def test_delete_menus() -> None:
+    for menu in requests.get(APP_ROOT_URL).json():
+        requests.delete(f"{APP_ROOT_URL}/{menu['id']}")
+
+    assert requests.get(APP_ROOT_URL).json() == []
+
+
+def test_import_tsv_without_descriptions() -> None:
+    # NULL-описание выгружается пустой ячейкой и загружается обратно как NULL
+    requests.post(
+        import_url,
+        json={
+            'menus': [
+                {
+                    'title': 'Меню без описания',
+                    'submenus': [
+                        {
+                            'title': 'Подменю без описания',
+                            'dishes': [{'title': 'Блюдо без описания', 'price': '1.00'}],
+                        },
+                    ],
+                },
+            ],
+        },
+    )
+    tsv_text = requests.get(menu_content_url).text
+    menu_id = requests.get(APP_ROOT_URL).json()[0]['id']
+    requests.delete(f'{APP_ROOT_URL}/{menu_id}')
+
+    resp = requests.post(
+        import_url,
+        data=tsv_text.encode(),
+        headers={'Content-Type': 'text/tab-separated-values'},
+    )
+    menu = requests.get(f'{APP_ROOT_URL}/{menu_id}').json()
+    requests.delete(f'{APP_ROOT_URL}/{menu_id}')
+
+    assert 'None' not in tsv_text
+    assert tsv_text.split('\n')[0] == f'{menu_id}\tМеню без описания\t\t\t\t'
+    assert resp.status_code == 201
+    assert menu['description'] is None
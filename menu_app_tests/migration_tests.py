@@ -0,0 +1,156 @@
+import asyncio
+
+# Модели импортируются ради регистрации таблиц в Base.metadata
+import menu_app.models.dish  # noqa: F401
+import menu_app.models.menu  # noqa: F401
+import menu_app.models.submenu  # noqa: F401
+import pytest
+from menu_app.database import POSTGRES_DB, SQLALCHEMY_DATABASE_URL, Base
+from menu_app.migrations import SCHEMA_VERSION, check_schema_version, migrate
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+MIGRATIONS_DB = f'{POSTGRES_DB}_migrations'
+MIGRATIONS_URL = SQLALCHEMY_DATABASE_URL.rsplit('/', 1)[0] + f'/{MIGRATIONS_DB}'
+
+
+class TestMigrations:
+    async def recreate_database(self, drop_only: bool = False) -> None:
+        engine = create_async_engine(
+            SQLALCHEMY_DATABASE_URL,
+            poolclass=NullPool,
+            isolation_level='AUTOCOMMIT',
+        )
+
+        async with engine.connect() as conn:
+            await conn.execute(text(f'DROP DATABASE IF EXISTS {MIGRATIONS_DB}'))
+            if not drop_only:
+                await conn.execute(text(f'CREATE DATABASE {MIGRATIONS_DB}'))
+
+        await engine.dispose()
+
+    async def read_counts(self, engine: AsyncEngine) -> tuple[int, int]:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                text('SELECT submenus_count, dishes_count FROM menus'),
+            )
+            return result.one()
+
+    async def read_columns(self, engine: AsyncEngine) -> dict[str, dict[str, str | None]]:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                text(
+                    "SELECT table_name, column_name, column_default \
+                    FROM information_schema.columns WHERE table_schema = 'public'"
+                ),
+            )
+            columns: dict[str, dict[str, str | None]] = {}
+            for table_name, column_name, column_default in result:
+                columns.setdefault(table_name, {})[column_name] = column_default
+
+        return columns
+
+    @pytest.mark.asyncio
+    async def test_migrate_is_idempotent_and_safe_to_run_concurrently(self) -> None:
+        await self.recreate_database()
+
+        # У каждого запуска свое соединение, как у отдельных процессов деплоя
+        engines = [
+            create_async_engine(MIGRATIONS_URL, poolclass=NullPool)
+            for _ in range(3)
+        ]
+
+        try:
+            with pytest.raises(RuntimeError):
+                await check_schema_version(engines[0])
+
+            applied_migrations = await asyncio.gather(
+                *(migrate(engine) for engine in engines),
+            )
+
+            async with engines[0].begin() as conn:
+                await conn.execute(
+                    text(
+                        "INSERT INTO menus (id, title, description) \
+                        VALUES (gen_random_uuid(), 'Меню', '')"
+                    ),
+                )
+                await conn.execute(
+                    text(
+                        "INSERT INTO submenus (id, menu_id, title, description) \
+                        SELECT gen_random_uuid(), id, 'Подменю', '' FROM menus"
+                    ),
+                )
+
+            repeated_migrations = await migrate(engines[0])
+            await check_schema_version(engines[0])
+            counts = await self.read_counts(engines[0])
+            columns = await self.read_columns(engines[0])
+        finally:
+            for engine in engines:
+                await engine.dispose()
+
+            await self.recreate_database(drop_only=True)
+
+        assert sorted(applied_migrations) == [0, 0, SCHEMA_VERSION]
+        # Повторная миграция не трогает данные, триггеры счетчиков на месте
+        assert repeated_migrations == 0
+        assert counts == (1, 0)
+        # Зафиксированная исходная схема и миграции после нее дают схему моделей
+        for table in Base.metadata.sorted_tables:
+            assert set(columns[table.name]) == set(table.columns.keys())
+            assert columns[table.name]['id'] == 'uuid_generate_v7()'
+
+    @pytest.mark.asyncio
+    async def test_migrate_recreates_legacy_tables(self) -> None:
+        await self.recreate_database()
+        engine = create_async_engine(MIGRATIONS_URL, poolclass=NullPool)
+
+        try:
+            # Таблицы от create_all прежних версий: без счетчиков и schema_version
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(
+                        'CREATE TABLE menus (id UUID PRIMARY KEY, title VARCHAR, \
+                        description VARCHAR)'
+                    ),
+                )
+                await conn.execute(
+                    text(
+                        'CREATE TABLE submenus (id UUID PRIMARY KEY, title VARCHAR, \
+                        description VARCHAR, menu_id UUID REFERENCES menus (id) ON DELETE CASCADE)'
+                    ),
+                )
+                await conn.execute(
+                    text("INSERT INTO menus VALUES (gen_random_uuid(), 'Старое меню', '')"),
+                )
+
+            applied_migrations = await migrate(engine)
+
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(
+                        "INSERT INTO menus (id, title, description) \
+                        VALUES (gen_random_uuid(), 'Меню', '')"
+                    ),
+                )
+                await conn.execute(
+                    text(
+                        "INSERT INTO submenus (id, menu_id, title, description) \
+                        SELECT gen_random_uuid(), id, 'Подменю', '' FROM menus"
+                    ),
+                )
+
+            await check_schema_version(engine)
+            counts = await self.read_counts(engine)
+            columns = await self.read_columns(engine)
+        finally:
+            await engine.dispose()
+            await self.recreate_database(drop_only=True)
+
+        assert applied_migrations == SCHEMA_VERSION
+        # Старые таблицы пересозданы со счетчиками, триггеры работают
+        assert counts == (1, 0)
+        for table in Base.metadata.sorted_tables:
+            assert set(columns[table.name]) == set(table.columns.keys())
@@ -0,0 +1,75 @@
+import requests
+from menu_app_tests import APP_ROOT_URL
+
+menu_ids = []
+
+
+def test_create_menus() -> None:
+    for number in range(3):
+        created_menu_resp = requests.post(
+            APP_ROOT_URL,
+            json={'title': f'Page menu {number}', 'description': 'Page menu'},
+        )
+
+        assert created_menu_resp.status_code == 201
+        menu_ids.append(created_menu_resp.json()['id'])
+
+    menu_ids.sort()
+
+
+def test_read_first_page() -> None:
+    page_resp = requests.get(APP_ROOT_URL, params={'limit': 2})
+
+    assert page_resp.status_code == 200
+    assert [menu['id'] for menu in page_resp.json()] == menu_ids[:2]
+
+
+def test_read_next_page() -> None:
+    page_resp = requests.get(
+        APP_ROOT_URL,
+        params={'limit': 2, 'after': menu_ids[1]},
+    )
+
+    assert page_resp.status_code == 200
+    assert [menu['id'] for menu in page_resp.json()] == menu_ids[2:]
+
+
+def test_read_page_after_updating() -> None:
+    updated_menu_resp = requests.patch(
+        f'{APP_ROOT_URL}/{menu_ids[0]}',
+        json={'title': 'Updated page menu', 'description': 'Page menu'},
+    )
+
+    assert updated_menu_resp.status_code == 200
+
+    page_resp = requests.get(APP_ROOT_URL, params={'limit': 2})
+
+    assert page_resp.json()[0]['title'] == 'Updated page menu'
+
+
+def test_read_page_after_deleting() -> None:
+    resp = requests.delete(f'{APP_ROOT_URL}/{menu_ids[2]}')
+
+    assert resp.status_code == 200
+
+    page_resp = requests.get(
+        APP_ROOT_URL,
+        params={'limit': 2, 'after': menu_ids[1]},
+    )
+
+    assert page_resp.json() == []
+
+
+def test_read_page_with_invalid_limit() -> None:
+    page_resp = requests.get(APP_ROOT_URL, params={'limit': 0})
+
+    assert page_resp.status_code == 422
+
+
+def test_delete_menus() -> None:
+    for menu_id in menu_ids[:2]:
+        resp = requests.delete(f'{APP_ROOT_URL}/{menu_id}')
+
+        assert resp.status_code == 200
+
+    assert requests.get(APP_ROOT_URL).json() == []
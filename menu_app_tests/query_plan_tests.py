@@ -0,0 +1,58 @@
+from collections.abc import Awaitable, Callable
+from typing import Any
+from uuid import uuid4
+
+import pytest
+from menu_app.database import SQLALCHEMY_DATABASE_URL
+from menu_app.restaurant_repo import RestaurantRepository
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+
+class TestQueryPlan:
+    async def explain(self, load: Callable[[RestaurantRepository], Awaitable[Any]]) -> str:
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany) -> None:
+            statements.append((statement, parameters))
+
+        # У каждого теста свой event loop, поэтому соединения без пула
+        engine = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+        event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+
+        async with sessionmaker(engine, class_=AsyncSession)() as db:
+            await load(RestaurantRepository(db))
+
+            statement, parameters = statements[-1]
+
+            # На маленьких таблицах планировщик всегда выбирает Seq Scan,
+            # поэтому проверяем, что индексный план вообще возможен
+            await db.execute(text('SET LOCAL enable_seqscan = off'))
+            conn = await db.connection()
+            result = await conn.exec_driver_sql(f'EXPLAIN {statement}', parameters)
+            plan = '\n'.join(row[0] for row in result)
+
+            await db.rollback()
+
+        await engine.dispose()
+
+        return plan
+
+    @pytest.mark.asyncio
+    async def test_read_submenus_uses_menu_id_index(self) -> None:
+        plan = await self.explain(lambda repo: repo.read_submenus(uuid4()))
+
+        assert 'ix_submenus_menu_id' in plan
+        assert 'Seq Scan' not in plan
+        assert ' on menus' not in plan
+
+    @pytest.mark.asyncio
+    async def test_read_dishes_uses_submenu_id_index(self) -> None:
+        plan = await self.explain(lambda repo: repo.read_dishes(uuid4()))
+
+        assert 'ix_dishes_submenu_id' in plan
+        assert 'Seq Scan' not in plan
+        assert ' on submenus' not in plan
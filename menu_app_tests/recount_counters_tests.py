@@ -0,0 +1,89 @@
+import time
+from uuid import uuid4
+
+import pytest
+import requests
+from menu_app.database import SQLALCHEMY_DATABASE_URL
+from menu_app.redis_cache import redis
+from menu_app.restaurant_repo import RestaurantRepository
+from menu_app.restaurant_service import RestaurantService, invalidate_menu_item
+from menu_app_tests import APP_ROOT_URL
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+
+class TestRecountCounters:
+    def create_catalog(self) -> tuple[str, str]:
+        menu_id = requests.post(
+            APP_ROOT_URL,
+            json={'title': f'Меню {uuid4()}', 'description': ''},
+        ).json()['id']
+        submenu_id = requests.post(
+            f'{APP_ROOT_URL}/{menu_id}/submenus',
+            json={'title': f'Подменю {uuid4()}', 'description': ''},
+        ).json()['id']
+        requests.post(
+            f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}/dishes',
+            json={'title': f'Блюдо {uuid4()}', 'description': '', 'price': '10.50'},
+        )
+
+        return menu_id, submenu_id
+
+    def read_counts(self, menu_id: str, submenu_id: str) -> tuple[int, int, int]:
+        menu = requests.get(f'{APP_ROOT_URL}/{menu_id}').json()
+        submenu = requests.get(f'{APP_ROOT_URL}/{menu_id}/submenus/{submenu_id}').json()
+
+        return menu['submenus_count'], menu['dishes_count'], submenu['dishes_count']
+
+    def wait_for_counts(
+        self,
+        menu_id: str,
+        submenu_id: str,
+        expected: tuple[int, int, int],
+    ) -> tuple[int, int, int]:
+        # Локальный кеш сервера сбрасывается через pub/sub,
+        # сообщение из процесса тестов приходит с небольшой задержкой
+        deadline = time.monotonic() + 2
+        counts = self.read_counts(menu_id, submenu_id)
+        while counts != expected and time.monotonic() < deadline:
+            time.sleep(0.05)
+            counts = self.read_counts(menu_id, submenu_id)
+
+        return counts
+
+    @pytest.mark.asyncio
+    async def test_recount_repairs_counters_and_clears_cache(self) -> None:
+        menu_id, submenu_id = self.create_catalog()
+        engine = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+
+        try:
+            async with sessionmaker(engine, class_=AsyncSession)() as db:
+                # Счетчики разошлись с данными в обход триггеров
+                await db.execute(
+                    text('UPDATE menus SET submenus_count = 5, dishes_count = 7 WHERE id = :id'),
+                    {'id': menu_id},
+                )
+                await db.execute(
+                    text('UPDATE submenus SET dishes_count = 3 WHERE id = :id'),
+                    {'id': submenu_id},
+                )
+                await db.commit()
+
+                # Кэш меню сбрасывается, как по истечении TTL,
+                # и заполняется испорченными счетчиками
+                await invalidate_menu_item(menu_id)
+                corrupted_counts = self.wait_for_counts(menu_id, submenu_id, (5, 7, 3))
+
+                fixed_rows = await RestaurantService(RestaurantRepository(db)).recount_counters()
+        finally:
+            await engine.dispose()
+            await redis.connection_pool.disconnect()
+
+        repaired_counts = self.wait_for_counts(menu_id, submenu_id, (1, 1, 1))
+        requests.delete(f'{APP_ROOT_URL}/{menu_id}')
+
+        assert corrupted_counts == (5, 7, 3)
+        assert fixed_rows >= 2
+        assert repaired_counts == (1, 1, 1)
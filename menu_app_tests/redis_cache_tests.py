@@ -0,0 +1,507 @@
+import asyncio
+import json
+from typing import Any
+from uuid import uuid4
+
+import pytest
+from menu_app import redis_cache
+from menu_app.redis_cache import (
+    RedisCache,
+    dump_body,
+    make_etag,
+    make_incr_op,
+    make_set_op,
+    make_upsert_op,
+    redis,
+)
+from menu_app.schemas.menu import Menu as MenuSchema
+from pydantic import parse_obj_as
+
+
+def make_menu(title: str, submenus_count: int = 0) -> dict[str, Any]:
+    return {
+        'id': str(uuid4()),
+        'title': title,
+        'description': '',
+        'submenus_count': submenus_count,
+        'dishes_count': 0,
+    }
+
+
+class CountingLoader:
+    # Загрузчик из "БД": считает вызовы и отвечает с задержкой,
+    # чтобы конкурирующие запросы успели застать загрузку
+    def __init__(self, result: Any, delay: float = 0.1) -> None:
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self) -> Any:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.result
+
+
+class TestRedisCache:
+    @pytest.fixture(autouse=True)
+    def without_local_cache(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Каждое чтение идет в Redis, а не в локальный кэш процесса
+        monkeypatch.setattr(redis_cache, 'local_cache', redis_cache.LocalCache(0, 0))
+
+    async def close(self) -> None:
+        # У каждого теста свой event loop, соединения прежнего не переиспользуются
+        await redis.connection_pool.disconnect()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_load_once_per_process(self) -> None:
+        key = f'tests/{uuid4()}'
+        loader = CountingLoader(make_menu('Меню'))
+        coalesced = redis_cache.stats.coalesced
+
+        try:
+            entries = await asyncio.gather(
+                *(RedisCache.read(key, MenuSchema, loader) for _ in range(5)),
+            )
+        finally:
+            await self.close()
+
+        assert loader.calls == 1
+        assert len(set(entries)) == 1
+        assert redis_cache.stats.coalesced - coalesced == 4
+
+    @pytest.mark.asyncio
+    async def test_cached_read_takes_one_round_trip(self) -> None:
+        key = f'tests/{uuid4()}'
+        stats = redis_cache.stats
+
+        try:
+            await RedisCache.read(key, MenuSchema, CountingLoader(make_menu('Меню')))
+            # Инвалидация идет только в общий счетчик обращений
+            await RedisCache.delete(f'tests/{uuid4()}')
+
+            reads, read_round_trips = stats.reads, stats.read_round_trips
+            for _ in range(3):
+                await RedisCache.read(key, MenuSchema, CountingLoader(None))
+        finally:
+            await self.close()
+
+        assert stats.reads - reads == 3
+        assert stats.read_round_trips - read_round_trips == 3
+        assert stats.round_trips > stats.read_round_trips
+
+    @pytest.mark.asyncio
+    async def test_lock_lets_one_worker_load(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(redis_cache, 'CACHE_LOCK_ENABLED', True)
+
+        key = f'tests/{uuid4()}'
+        loader = CountingLoader(make_menu('Меню'))
+
+        try:
+            # Загрузки в обход load_once - как у двух воркеров
+            values = await asyncio.gather(
+                RedisCache.load(key, MenuSchema, loader),
+                RedisCache.load(key, MenuSchema, loader),
+            )
+            lock_holder = await redis.get(f'lock:{key}')
+        finally:
+            await self.close()
+
+        assert loader.calls == 1
+        assert values[0] == values[1]
+        assert lock_holder is None
+
+    @pytest.mark.asyncio
+    async def test_lock_waiter_loads_when_holder_finds_nothing(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(redis_cache, 'CACHE_LOCK_ENABLED', True)
+
+        key = f'tests/{uuid4()}'
+        loader = CountingLoader(None)
+
+        try:
+            values = await asyncio.gather(
+                RedisCache.load(key, MenuSchema, loader),
+                RedisCache.load(key, MenuSchema, loader),
+            )
+        finally:
+            await self.close()
+
+        # Пустой результат не кэшируется, поэтому второй воркер идет в БД сам
+        assert loader.calls == 2
+        assert values == [None, None]
+
+    @pytest.mark.asyncio
+    async def test_invalidated_entries_and_versions_expire(self) -> None:
+        list_key = f'tests/{uuid4()}/submenus'
+        item_key = f'{list_key}/{uuid4()}'
+        menu = make_menu('Меню')
+
+        try:
+            for _ in range(2):
+                await RedisCache.read(list_key, list[MenuSchema], CountingLoader([menu], 0))
+                await RedisCache.read(item_key, MenuSchema, CountingLoader(menu, 0))
+                await RedisCache.delete(list_key)
+
+            keys = [key async for key in redis.scan_iter(match=f'*{list_key}*')]
+            ttls = [await redis.ttl(key) for key in keys]
+        finally:
+            await self.close()
+
+        # Записи прежних версий никто не читает: их убирает только TTL
+        assert len(keys) >= 4
+        assert all(ttl > 0 for ttl in ttls)
+
+    @pytest.mark.asyncio
+    async def test_prefix_memory_is_measured_in_scan_batches(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(redis_cache, 'CACHE_MEMORY_SCAN_BATCH', 10)
+
+        menu_id = uuid4()
+        keys = [f'menus/{menu_id}/submenus/{uuid4()}' for _ in range(25)]
+
+        try:
+            await redis.mset({key: 'x' * 100 for key in keys})
+            await redis.set(f'lock:menus/{menu_id}', '1')
+            prefixes = await RedisCache.get_prefix_memory(match=f'*menus/{menu_id}*')
+            await redis.delete(*keys, f'lock:menus/{menu_id}')
+        finally:
+            await self.close()
+
+        assert prefixes['submenus']['keys'] == 25
+        assert prefixes['submenus']['bytes'] >= 25 * 100
+        assert prefixes['lock']['keys'] == 1
+
+    async def wait_for_refreshes(self) -> None:
+        await asyncio.gather(*redis_cache.inflight_loads.values())
+
+    @pytest.fixture
+    def stale_while_revalidate(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Запись живет секунду и еще окно SWR, в котором считается устаревшей
+        monkeypatch.setattr(redis_cache, 'CACHE_SWR_ENABLED', True)
+        monkeypatch.setattr(redis_cache, 'CACHE_SWR_WINDOW', 60)
+        monkeypatch.setitem(redis_cache.CACHE_TTLS, 'menus', 1)
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures('stale_while_revalidate')
+    async def test_stale_entry_is_served_while_one_refresh_runs(self) -> None:
+        key = f'tests/{uuid4()}'
+        menu = make_menu('Старое меню')
+        refresh_loader = CountingLoader({**menu, 'title': 'Новое меню'}, 0.2)
+
+        try:
+            await RedisCache.read(key, MenuSchema, CountingLoader(menu, 0))
+            await asyncio.sleep(1.1)
+
+            stale_entries = await asyncio.gather(
+                *(
+                    RedisCache.read(key, MenuSchema, CountingLoader(None), refresh_loader)
+                    for _ in range(3)
+                ),
+            )
+            await self.wait_for_refreshes()
+
+            fresh_entry = await RedisCache.read(key, MenuSchema, CountingLoader(None))
+        finally:
+            await self.close()
+
+        assert all('Старое меню' in entry.body for entry in stale_entries)
+        assert refresh_loader.calls == 1
+        assert 'Новое меню' in fresh_entry.body
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures('stale_while_revalidate')
+    async def test_stale_copy_is_served_after_invalidation_until_deleted(self) -> None:
+        key = f'tests/{uuid4()}'
+        loader = CountingLoader(None)
+        refresh_loader = CountingLoader(None)
+
+        try:
+            await RedisCache.read(key, MenuSchema, CountingLoader(make_menu('Меню'), 0))
+            await RedisCache.delete(key)
+
+            # Объект удален: обновление не находит его и убирает копию
+            stale_entry = await RedisCache.read(key, MenuSchema, loader, refresh_loader)
+            await self.wait_for_refreshes()
+
+            stale_copy = await redis.get(redis_cache.get_stale_key(key))
+            entry = await RedisCache.read(key, MenuSchema, loader, refresh_loader)
+        finally:
+            await self.close()
+
+        assert 'Меню' in stale_entry.body
+        assert refresh_loader.calls == 1
+        assert stale_copy is None
+        assert entry is None
+        assert loader.calls == 1
+
+    def dump_menus(self, *menus: dict[str, Any]) -> str:
+        return dump_body(parse_obj_as(list[MenuSchema], menus))
+
+    def dump_menu(self, menu: dict[str, Any]) -> str:
+        return dump_body(parse_obj_as(MenuSchema, menu))
+
+    @pytest.mark.asyncio
+    async def test_write_through_upsert_matches_loaded_body(self) -> None:
+        list_key = f'tests/{uuid4()}'
+        # Слеш, кавычки и кириллица: cjson закодировал бы их иначе, чем dump_body
+        first_menu = make_menu('Первое / "особое"')
+        second_menu = make_menu('Второе')
+        updated_menu = {**second_menu, 'title': 'Второе \\ обновленное'}
+        new_menu = make_menu('Третье')
+
+        try:
+            await RedisCache.read(
+                list_key,
+                list[MenuSchema],
+                CountingLoader([first_menu, second_menu], 0),
+            )
+            await RedisCache.write_through([
+                make_upsert_op(list_key, self.dump_menu(updated_menu)),
+                make_upsert_op(list_key, self.dump_menu(new_menu)),
+            ])
+            entry = await RedisCache.read(list_key, list[MenuSchema], CountingLoader(None))
+        finally:
+            await self.close()
+
+        expected_body = self.dump_menus(first_menu, updated_menu, new_menu)
+
+        assert entry.body == expected_body
+        assert entry.etag == make_etag(expected_body)
+
+    @pytest.mark.asyncio
+    async def test_write_through_updates_counters_in_item_and_list(self) -> None:
+        list_key = f'tests/{uuid4()}'
+        menu = make_menu('Меню', submenus_count=9)
+        other_menu = make_menu('Другое меню', submenus_count=9)
+        item_key = f'{list_key}/{menu["id"]}'
+
+        try:
+            await RedisCache.read(item_key, MenuSchema, CountingLoader(menu, 0))
+            await RedisCache.read(
+                list_key,
+                list[MenuSchema],
+                CountingLoader([menu, other_menu], 0),
+            )
+            await RedisCache.write_through([
+                make_incr_op(item_key, 'submenus_count', 1),
+                make_incr_op(list_key, 'submenus_count', 1, menu['id']),
+            ])
+            item_entry = await RedisCache.read(item_key, MenuSchema, CountingLoader(None))
+            list_entry = await RedisCache.read(list_key, list[MenuSchema], CountingLoader(None))
+        finally:
+            await self.close()
+
+        updated_menu = {**menu, 'submenus_count': 10}
+
+        assert item_entry.body == self.dump_menu(updated_menu)
+        assert item_entry.etag == make_etag(item_entry.body)
+        assert list_entry.body == self.dump_menus(updated_menu, other_menu)
+        assert list_entry.etag == make_etag(list_entry.body)
+
+    @pytest.mark.asyncio
+    async def test_write_through_drops_list_pages(self) -> None:
+        list_key = f'tests/{uuid4()}'
+        page_key = f'{list_key}?limit=10&after='
+        menu = make_menu('Меню')
+        page_loader = CountingLoader([menu], 0)
+
+        try:
+            await RedisCache.read(list_key, list[MenuSchema], CountingLoader([menu], 0))
+            await RedisCache.read(page_key, list[MenuSchema], page_loader)
+            await RedisCache.read(page_key, list[MenuSchema], page_loader)
+
+            # Страницы не правятся на месте: после записи они загружаются заново
+            await RedisCache.write_through([
+                make_upsert_op(list_key, self.dump_menu(make_menu('Новое меню'))),
+            ])
+            await RedisCache.read(page_key, list[MenuSchema], page_loader)
+        finally:
+            await self.close()
+
+        assert page_loader.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_load_started_before_write_does_not_overwrite_it(self) -> None:
+        list_key = f'tests/{uuid4()}'
+        old_menu = make_menu('Старое меню')
+        new_menu = {**old_menu, 'title': 'Новое меню'}
+        item_key = f'{list_key}/{old_menu["id"]}'
+        list_loader = CountingLoader([new_menu], 0)
+
+        try:
+            # Загрузки прочитали старые данные до записи, а в Redis кладут после нее
+            item_load = asyncio.ensure_future(
+                RedisCache.read(item_key, MenuSchema, CountingLoader(old_menu, 0.2)),
+            )
+            list_load = asyncio.ensure_future(
+                RedisCache.read(list_key, list[MenuSchema], CountingLoader([old_menu], 0.2)),
+            )
+            await asyncio.sleep(0.05)
+
+            body = self.dump_menu(new_menu)
+            await RedisCache.write_through([
+                make_set_op(item_key, body),
+                make_upsert_op(list_key, body),
+            ])
+            await asyncio.gather(item_load, list_load)
+
+            item_entry = await RedisCache.read(item_key, MenuSchema, CountingLoader(None))
+            list_entry = await RedisCache.read(list_key, list[MenuSchema], list_loader)
+        finally:
+            await self.close()
+
+        # Запись write-through не перезаписана (NX), а список без записи
+        # потерял версию: старое значение лежит под ней, и список грузится снова
+        assert item_entry.body == body
+        assert list_entry.body == self.dump_menus(new_menu)
+        assert list_loader.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_one_worker_claims_warmup(self) -> None:
+        try:
+            await redis.delete(redis_cache.CACHE_WARMUP_KEY)
+            claims = await asyncio.gather(*(RedisCache.claim_warmup() for _ in range(3)))
+            mark_ttl = await redis.ttl(redis_cache.CACHE_WARMUP_KEY)
+            await redis.delete(redis_cache.CACHE_WARMUP_KEY)
+        finally:
+            await self.close()
+
+        assert sorted(claims) == [False, False, True]
+        assert 0 < mark_ttl <= redis_cache.CACHE_WARMUP_MARK_TTL
+
+    @pytest.mark.asyncio
+    async def test_waiting_workers_see_finished_warmup(self) -> None:
+        async def finish_later() -> None:
+            await asyncio.sleep(0.3)
+            await RedisCache.finish_warmup()
+
+        try:
+            await redis.delete(redis_cache.CACHE_WARMUP_KEY, redis_cache.CACHE_WARMUP_DONE_KEY)
+            await RedisCache.claim_warmup()
+            *waits, _ = await asyncio.gather(
+                RedisCache.wait_for_warmup(2),
+                RedisCache.wait_for_warmup(2),
+                finish_later(),
+            )
+            await redis.delete(redis_cache.CACHE_WARMUP_KEY, redis_cache.CACHE_WARMUP_DONE_KEY)
+        finally:
+            await self.close()
+
+        assert waits == [True, True]
+
+    @pytest.mark.asyncio
+    async def test_failed_warmup_releases_claim(self) -> None:
+        async def fail_later() -> None:
+            await asyncio.sleep(0.3)
+            await RedisCache.release_warmup()
+
+        try:
+            await redis.delete(redis_cache.CACHE_WARMUP_KEY, redis_cache.CACHE_WARMUP_DONE_KEY)
+            await RedisCache.claim_warmup()
+            started = asyncio.get_running_loop().time()
+            waited, _ = await asyncio.gather(RedisCache.wait_for_warmup(5), fail_later())
+            wait_time = asyncio.get_running_loop().time() - started
+            # Следующий воркер снова может взять заявку
+            reclaimed = await RedisCache.claim_warmup()
+            await redis.delete(redis_cache.CACHE_WARMUP_KEY)
+        finally:
+            await self.close()
+
+        assert waited is False
+        assert wait_time < 1
+        assert reclaimed is True
+
+
+class TestLocalCache:
+    @pytest.fixture(autouse=True)
+    def with_local_cache(self, monkeypatch: pytest.MonkeyPatch) -> redis_cache.LocalCache:
+        local_cache = redis_cache.LocalCache(16, 60)
+        monkeypatch.setattr(redis_cache, 'local_cache', local_cache)
+
+        return local_cache
+
+    def test_least_recently_used_entry_is_evicted(self) -> None:
+        local_cache = redis_cache.LocalCache(2, 60)
+
+        local_cache.set('menus/1', 'first', local_cache.epoch)
+        local_cache.set('menus/2', 'second', local_cache.epoch)
+        local_cache.get('menus/1')
+        local_cache.set('menus/3', 'third', local_cache.epoch)
+
+        assert local_cache.get('menus/2') is None
+        assert local_cache.get('menus/1') == 'first'
+        assert local_cache.get('menus/3') == 'third'
+
+    @pytest.mark.asyncio
+    async def test_entry_expires_after_ttl(self) -> None:
+        local_cache = redis_cache.LocalCache(2, 0.05)
+
+        local_cache.set('menus/1', 'first', local_cache.epoch)
+        fresh_value = local_cache.get('menus/1')
+        await asyncio.sleep(0.1)
+
+        assert fresh_value == 'first'
+        assert local_cache.get('menus/1') is None
+        assert 'menus/1' not in local_cache.entries
+
+    @pytest.mark.asyncio
+    async def test_load_started_before_invalidation_is_not_cached(
+        self,
+        with_local_cache: redis_cache.LocalCache,
+    ) -> None:
+        key = f'tests/{uuid4()}'
+
+        async def invalidate_during_load() -> None:
+            await asyncio.sleep(0.05)
+            with_local_cache.invalidate([key])
+
+        try:
+            await asyncio.gather(
+                RedisCache.read(key, MenuSchema, CountingLoader(make_menu('Меню'), 0.2)),
+                invalidate_during_load(),
+            )
+            value_after_race = with_local_cache.get(key)
+
+            # Следующее чтение после инвалидации снова кладет запись локально
+            await RedisCache.read(key, MenuSchema, CountingLoader(None))
+            value_after_read = with_local_cache.get(key)
+        finally:
+            await redis.connection_pool.disconnect()
+
+        assert value_after_race is None
+        assert value_after_read is not None
+
+    @pytest.mark.asyncio
+    async def test_published_invalidation_clears_entry(
+        self,
+        with_local_cache: redis_cache.LocalCache,
+    ) -> None:
+        key = f'tests/{uuid4()}'
+        listener = asyncio.create_task(RedisCache.listen_invalidations())
+
+        try:
+            # После подписки слушатель очищает локальный кэш и сдвигает эпоху
+            for _ in range(100):
+                if with_local_cache.epoch > 0:
+                    break
+                await asyncio.sleep(0.01)
+
+            with_local_cache.set(key, 'value', with_local_cache.epoch)
+            cached_value = with_local_cache.get(key)
+
+            await redis.publish(redis_cache.INVALIDATION_CHANNEL, json.dumps([key]))
+            for _ in range(100):
+                if with_local_cache.get(key) is None:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            await redis.connection_pool.disconnect()
+
+        assert cached_value == 'value'
+        assert with_local_cache.get(key) is None
@@ -0,0 +1,162 @@
+import json
+import os
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+from menu_app.database import (
+    POSTGRES_DB,
+    SQLALCHEMY_DATABASE_URL,
+    Base,
+    ReplicaSet,
+    RoutingSession,
+    read_from_primary,
+)
+from menu_app.redis_cache import redis
+from menu_app.restaurant_repo import RestaurantRepository
+from menu_app.restaurant_service import RestaurantService, invalidate_menu_item
+from menu_app.schemas.menu import MenuCreate
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+# Вместо настоящей реплики - отдельная пустая БД на том же сервере:
+# меню, созданное в основной БД, в ней не видно
+REPLICA_DB = f'{POSTGRES_DB}_replica'
+REPLICA_URL = os.getenv(
+    'DB_REPLICA_TEST_URL',
+    SQLALCHEMY_DATABASE_URL.rsplit('/', 1)[0] + f'/{REPLICA_DB}',
+)
+UNREACHABLE_URL = SQLALCHEMY_DATABASE_URL.replace(':5432/', ':1/')
+
+
+class TestReplicaRouting:
+    async def create_replica(self) -> None:
+        engine = create_async_engine(
+            SQLALCHEMY_DATABASE_URL,
+            poolclass=NullPool,
+            isolation_level='AUTOCOMMIT',
+        )
+
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                text('SELECT 1 FROM pg_database WHERE datname = :name'),
+                {'name': REPLICA_DB},
+            )
+            if result.scalar() is None:
+                await conn.execute(text(f'CREATE DATABASE {REPLICA_DB}'))
+
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_reads_go_to_replica_and_writes_to_primary(self) -> None:
+        if 'DB_REPLICA_TEST_URL' not in os.environ:
+            await self.create_replica()
+
+        primary = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+        replica = create_async_engine(REPLICA_URL, poolclass=NullPool)
+        unreachable = create_async_engine(UNREACHABLE_URL, poolclass=NullPool)
+
+        async with replica.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        replicas = ReplicaSet([replica])
+        session_factory = sessionmaker(
+            primary,
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            replicas=replicas,
+            expire_on_commit=False,
+        )
+
+        async with session_factory() as db:
+            repo = RestaurantRepository(db)
+            menu = await repo.create_menu({'title': f'Меню {uuid4()}', 'description': ''})
+            # После записи сессия читает из основной БД
+            menu_after_write = await repo.read_menu(menu.id)
+
+        async with session_factory() as db:
+            menu_from_replica = await RestaurantRepository(db).read_menu(menu.id)
+
+        token = read_from_primary.set(True)
+        async with session_factory() as db:
+            menu_from_primary = await RestaurantRepository(db).read_menu(menu.id)
+        read_from_primary.reset(token)
+
+        # Недоступная реплика выходит из ротации, чтение идет в основную БД
+        replicas.engines = [unreachable]
+        await replicas.check_health()
+        async with session_factory() as db:
+            menu_without_replicas = await RestaurantRepository(db).read_menu(menu.id)
+
+            await RestaurantRepository(db).delete_menu(menu.id)
+
+        await primary.dispose()
+        await replica.dispose()
+        await unreachable.dispose()
+
+        assert menu_after_write is not None
+        assert menu_from_replica is None
+        assert menu_from_primary is not None
+        assert replicas.healthy == []
+        assert menu_without_replicas is not None
+
+    @pytest.mark.asyncio
+    async def test_cache_miss_follows_read_routing(self) -> None:
+        if 'DB_REPLICA_TEST_URL' not in os.environ:
+            await self.create_replica()
+
+        primary = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+        replica = create_async_engine(REPLICA_URL, poolclass=NullPool)
+
+        async with replica.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        session_factory = sessionmaker(
+            primary,
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            replicas=ReplicaSet([replica]),
+            expire_on_commit=False,
+        )
+
+        try:
+            async with session_factory() as db:
+                menu = await RestaurantService(RestaurantRepository(db)).create_menu(
+                    MenuCreate(title=f'Меню {uuid4()}', description=''),
+                )
+            # Запись в кэш при CACHE_WRITE_THROUGH=1 сброшена, как по истечении TTL
+            await invalidate_menu_item(menu.id)
+
+            # Вне окна после записи промах кэша заполняется из реплики,
+            # где меню еще нет
+            async with session_factory() as db:
+                with pytest.raises(HTTPException) as replica_error:
+                    await RestaurantService(RestaurantRepository(db)).read_menu(menu.id)
+
+            # Клиент с кукой read_primary заполняет кэш из основной БД
+            token = read_from_primary.set(True)
+            async with session_factory() as db:
+                service = RestaurantService(RestaurantRepository(db))
+                cached_menu = await service.read_menu(menu.id)
+
+                await service.delete_menu(menu.id)
+            read_from_primary.reset(token)
+        finally:
+            await primary.dispose()
+            await replica.dispose()
+            await redis.connection_pool.disconnect()
+
+        assert replica_error.value.status_code == 404
+        assert json.loads(cached_menu.body)['id'] == str(menu.id)
+
+    def test_replicas_are_used_round_robin(self) -> None:
+        engines = [
+            create_async_engine(REPLICA_URL, poolclass=NullPool),
+            create_async_engine(REPLICA_URL, poolclass=NullPool),
+        ]
+        replicas = ReplicaSet(engines)
+
+        assert [replicas.next_engine() for _ in range(4)] == engines * 2
+        assert ReplicaSet([]).next_engine() is None
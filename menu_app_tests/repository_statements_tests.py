@@ -0,0 +1,107 @@
+from collections.abc import Awaitable, Callable
+from decimal import Decimal
+from typing import Any
+from uuid import uuid4
+
+import pytest
+from menu_app.database import SQLALCHEMY_DATABASE_URL
+from menu_app.restaurant_repo import RestaurantRepository
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+
+class TestRepositoryStatements:
+    @pytest.mark.asyncio
+    async def test_each_write_is_one_statement(self) -> None:
+        statements: list[str] = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany) -> None:
+            statements.append(statement)
+
+        # У каждого теста свой event loop, поэтому соединения без пула
+        engine = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+        event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+
+        async with sessionmaker(engine, class_=AsyncSession)() as db:
+            repo = RestaurantRepository(db)
+
+            async def count(write: Callable[[], Awaitable[Any]]) -> tuple[Any, int]:
+                statements.clear()
+                result = await write()
+                return result, len(statements)
+
+            title = f'Меню {uuid4()}'
+            menu, menu_created = await count(
+                lambda: repo.create_menu({'title': title, 'description': 'Описание'}),
+            )
+            _, menu_updated = await count(
+                lambda: repo.update_menu(menu.id, {'title': title, 'description': 'Новое'}),
+            )
+            submenu, submenu_created = await count(
+                lambda: repo.create_submenu(
+                    {'menu_id': menu.id, 'title': f'Подменю {uuid4()}', 'description': ''},
+                ),
+            )
+            _, submenu_updated = await count(
+                lambda: repo.update_submenu(
+                    menu.id,
+                    submenu.id,
+                    {'title': f'Подменю {uuid4()}', 'description': 'Новое'},
+                ),
+            )
+            dish, dish_created = await count(
+                lambda: repo.create_dish(
+                    {
+                        'submenu_id': submenu.id,
+                        'title': f'Блюдо {uuid4()}',
+                        'description': '',
+                        'price': Decimal('10.50'),
+                    },
+                ),
+            )
+            updated_dish, dish_updated = await count(
+                lambda: repo.update_dish(
+                    submenu.id,
+                    dish.id,
+                    {'title': dish.title, 'description': 'Новое', 'price': Decimal('11.50')},
+                ),
+            )
+            missing_dish, _ = await count(
+                lambda: repo.update_dish(submenu.id, uuid4(), {'description': 'Нет'}),
+            )
+            dish_deleted, dish_delete_statements = await count(
+                lambda: repo.delete_dish(submenu.id, dish.id),
+            )
+            await repo.create_dish(
+                {
+                    'submenu_id': submenu.id,
+                    'title': f'Блюдо {uuid4()}',
+                    'description': '',
+                    'price': Decimal('1.00'),
+                },
+            )
+            menu_deleted, menu_delete_statements = await count(
+                lambda: repo.delete_menu(menu.id),
+            )
+            submenu_after_delete = await repo.read_submenu(menu.id, submenu.id)
+            dishes_after_delete = await repo.read_dishes(submenu.id)
+
+        await engine.dispose()
+
+        assert [
+            menu_created, menu_updated,
+            submenu_created, submenu_updated,
+            dish_created, dish_updated,
+            dish_delete_statements, menu_delete_statements,
+        ] == [1] * 8
+
+        assert menu.submenus_count == 0
+        assert updated_dish.price == Decimal('11.50')
+        assert missing_dish is None
+        assert dish_deleted and menu_deleted
+
+        # Подменю и блюда удалены каскадом в БД
+        assert submenu_after_delete is None
+        assert dishes_after_delete == []